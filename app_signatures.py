@@ -0,0 +1,122 @@
+"""
+app_signatures.py - Subscription app detection engine
+- Signatures versioned data file (app_signatures.json) se load hote hain
+- Saare keywords ek automaton mein compile → homepage HTML par single pass
+  (pyahocorasick installed ho to Aho–Corasick, warna purana per-keyword substring scan —
+  Python regex alternation us loop se bhi dheemi nikli, bench/bench_signatures.py)
+- Har app ke match positions + confidence
+"""
+
+import json
+import os
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+SIGNATURES_FILE = os.getenv(
+    "SIGNATURES_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_signatures.json"),
+)
+
+def load_signatures(path=SIGNATURES_FILE):
+    """Data file → (version, [(app_name, [(pattern, weight), ...]), ...])"""
+    with open(path, encoding="utf-8") as f:
+        doc = json.load(f)
+    apps = []
+    for app in doc["apps"]:
+        pats = []
+        for p in app["patterns"]:
+            if isinstance(p, str):
+                pats.append((p, 0.6))
+            else:
+                pats.append((p["pattern"], float(p.get("weight", 0.6))))
+        apps.append((app["name"], pats))
+    return doc.get("version", 0), apps
+
+class SignatureMatcher:
+    """
+    Saare app keywords ek automaton mein. match() ek hi pass mein
+    har app ke matched keywords, positions aur confidence deta hai.
+    """
+
+    def __init__(self, apps, version=0):
+        self.version  = version
+        self.apps     = apps
+        self._owners  = {}    # keyword (lower) → [(app, weight)]
+        for name, pats in apps:
+            for kw, weight in pats:
+                self._owners.setdefault(kw.lower(), []).append((name, weight))
+        keywords = list(self._owners)
+        self._rank = {kw: i for i, kw in enumerate(keywords)}
+        if ahocorasick is not None:
+            self.backend   = "aho-corasick"
+            self._automaton = ahocorasick.Automaton()
+            for kw in keywords:
+                self._automaton.add_word(kw, kw)
+            self._automaton.make_automaton()
+        else:
+            self.backend  = "substring"
+            self._keywords = keywords
+
+    def _scan(self, h):
+        """(keyword, start) har occurrence ke liye — overlapping bhi."""
+        if self.backend == "aho-corasick":
+            for end, kw in self._automaton.iter(h):
+                yield kw, end - len(kw) + 1
+            return
+        # Fallback: har keyword ke liye str.find (C mein) — legacy loop jaisa, bas saare positions
+        for kw in self._keywords:
+            pos = h.find(kw)
+            while pos != -1:
+                yield kw, pos
+                pos = h.find(kw, pos + 1)
+
+    @classmethod
+    def from_file(cls, path=SIGNATURES_FILE):
+        version, apps = load_signatures(path)
+        return cls(apps, version)
+
+    def match(self, html):
+        """
+        [{"app", "keywords", "positions", "confidence"}, ...] — data file ke order mein.
+        confidence = 1 - Π(1 - weight) matched distinct keywords par.
+        """
+        h = html.lower()
+        hits = {}    # keyword → {positions}
+        for kw, pos in self._scan(h):
+            hits.setdefault(kw, set()).add(pos)
+
+        per_app = {}
+        for kw, positions in sorted(hits.items(), key=lambda kv: self._rank[kv[0]]):
+            for name, weight in self._owners[kw]:
+                entry = per_app.setdefault(name, {"keywords":[], "positions":[], "miss":1.0})
+                entry["keywords"].append(kw)
+                entry["positions"].extend(positions)
+                entry["miss"] *= (1 - weight)
+
+        results = []
+        for name, _ in self.apps:
+            if name in per_app:
+                e = per_app[name]
+                results.append({
+                    "app":        name,
+                    "keywords":   e["keywords"],
+                    "positions":  sorted(e["positions"]),
+                    "confidence": round(1 - e["miss"], 3),
+                })
+        return results
+
+    @staticmethod
+    def label(matches):
+        """match() output → 'Recharge + Bold' / 'Native Shopify' / 'Unknown'."""
+        detected = [r["app"] for r in matches]
+        if not detected:
+            return "Unknown"
+        named = [d for d in detected if d != "Native Shopify"]
+        return " + ".join(named) if named else "Native Shopify"
+
+    def detect(self, html):
+        """Purana detect_app output."""
+        return self.label(self.match(html))
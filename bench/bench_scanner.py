@@ -0,0 +1,147 @@
+"""
+bench_scanner.py - Scanner ka offline throughput benchmark
+- bench/fake_shopify.py ko subprocess mein chalata hai, synthetic domains ki CSV banata hai
+- Scanner ko STORE_URL_TEMPLATE ke saath (triage aur Excel off) ek temp dir mein chalata hai
+- Report: stores/min, requests/s, peak RSS (sirf scanner process), per-stage p50/p95/p99
+- --json se result save; --baseline se pichhle result se compare (regression par exit 1)
+
+Usage:
+    python bench/bench_scanner.py --stores 200 --concurrency 12 --latency-ms 40
+    python bench/bench_scanner.py --stores 200 --json bench/last.json --baseline bench/baseline.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_shopify import add_server_args
+from metrics import read_traces, profile_tables
+
+REGRESSION_TOLERANCE = 0.10    # stores/min itna gira to regression
+
+def server_stats(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/__stats", timeout=5) as resp:
+        return json.load(resp)
+
+def start_server(argv, port):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "bench", "fake_shopify.py"), *argv],
+                            stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            server_stats(port)
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"fake server port {port} par start nahi hua")
+
+def run_scanner(workdir, env, extra_args):
+    """Scanner subprocess → (wall seconds, peak RSS MB, returncode)."""
+    log = open(os.path.join(workdir, "scanner.log"), "w")
+    t0   = time.time()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "shopify_deep_scanner.py"), *extra_args],
+                            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    _, status, usage = os.wait4(proc.pid, 0)
+    log.close()
+    return time.time() - t0, usage.ru_maxrss / 1024, os.waitstatus_to_exitcode(status)
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline scanner benchmark (fake Shopify server)")
+    ap.add_argument("--stores", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=12)
+    ap.add_argument("--scan-mode", default="full", choices=["full", "sampled", "adaptive"])
+    ap.add_argument("--json", help="result yahan save karo")
+    ap.add_argument("--baseline", help="pichhla --json result; stores/min gira to exit 1")
+    ap.add_argument("--keep", action="store_true", help="temp dir (outputs, trace, log) mat hatao")
+    add_server_args(ap)
+    args = ap.parse_args()
+
+    # Server ke flags usi ko forward (defaults bhi, taaki --json mein poora config rahe)
+    server_keys = vars(add_server_args(argparse.ArgumentParser(add_help=False)).parse_args([]))
+    server_argv = [x for k in server_keys for x in (f"--{k.replace('_', '-')}", str(getattr(args, k)))]
+
+    workdir = tempfile.mkdtemp(prefix="shopify_bench_")
+    domains = [f"store-{i}.bench" for i in range(args.stores)]
+    with open(os.path.join(workdir, "bench_domains.csv"), "w", encoding="utf-8") as f:
+        f.write("url\n" + "\n".join(domains) + "\n")
+
+    env = dict(os.environ,
+               INPUT_FILE="bench_domains.csv",
+               OUTPUT_FILE="bench_output.xlsx",
+               STORE_URL_TEMPLATE=f"http://127.0.0.1:{args.port}/{{domain}}",
+               CONCURRENCY=str(args.concurrency),
+               SCAN_MODE=args.scan_mode,
+               TRIAGE="0",
+               EXCEL_EXPORT="0",
+               CHUNK_TOTAL="1")
+    env.pop("SHARD_MANIFEST", None)
+
+    print(f"🧪 {args.stores} synthetic stores | concurrency={args.concurrency} | mode={args.scan_mode} | "
+          f"latency={args.latency_ms}ms | 429 rate={args.throttle_rate}", flush=True)
+    server = start_server(server_argv, args.port)
+    try:
+        wall, rss_mb, code = run_scanner(workdir, env, [])
+        stats = server_stats(args.port)
+    finally:
+        server.terminate()
+        server.wait()
+
+    traces   = read_traces(os.path.join(workdir, "bench_output.trace.jsonl"))
+    scanned  = len(traces)
+    result = {
+        "stores":         scanned,
+        "wall_s":         round(wall, 1),
+        "stores_per_min": round(scanned / max(wall / 60, 1e-9), 1),
+        "requests":       stats.get("requests", 0),
+        "requests_per_s": round(stats.get("requests", 0) / max(wall, 1e-9), 1),
+        "throttled":      stats.get("throttled", 0),
+        "peak_rss_mb":    round(rss_mb, 1),
+        "config":         {k: v for k, v in vars(args).items() if k not in ("json", "baseline", "keep")},
+    }
+    _, stages, _ = profile_tables(traces)
+    if not stages.empty:
+        result["stages"] = stages[["Stage", "Count", "p50_s", "p95_s", "p99_s"]].to_dict("records")
+
+    if code != 0:
+        print(f"❌ Scanner exit code {code} — log: {os.path.join(workdir, 'scanner.log')}", flush=True)
+    print(f"\n⚡ {result['stores_per_min']} stores/min | {result['requests_per_s']} req/s | "
+          f"peak RSS {result['peak_rss_mb']} MB | {scanned} stores in {result['wall_s']}s "
+          f"({result['throttled']} × 429)", flush=True)
+    if not stages.empty:
+        print("\n─── STAGE LATENCY ───", flush=True)
+        print(stages[["Stage", "Count", "p50_s", "p95_s", "p99_s", "Max_s"]].to_string(index=False), flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, default=str)
+        print(f"\n✅ Saved: {args.json}", flush=True)
+
+    regressed = False
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+        change = result["stores_per_min"] / max(base["stores_per_min"], 1e-9) - 1
+        print(f"\n📊 vs baseline: stores/min {base['stores_per_min']} → {result['stores_per_min']} ({change:+.0%}), "
+              f"peak RSS {base['peak_rss_mb']} → {result['peak_rss_mb']} MB", flush=True)
+        if change < -REGRESSION_TOLERANCE:
+            print(f"⚠️  Regression: throughput {-change:.0%} gira", flush=True)
+            regressed = True
+
+    if args.keep:
+        print(f"📁 Outputs: {workdir}", flush=True)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if regressed or code != 0 else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+bench_signatures.py - App signature matcher microbenchmark
+- Corpus: saved homepages (*.html). Scanner ko SAVE_HOMEPAGES_DIR=bench/homepages ke saath chalao
+- Corpus na ho to --synthetic N pages bana leta hai
+- Purana per-keyword substring loop vs compiled matcher (aho-corasick / substring fallback)
+
+Usage:
+    python bench/bench_signatures.py [--corpus bench/homepages] [--synthetic 50] [--repeat 5]
+"""
+
+import argparse
+import glob
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app_signatures
+from app_signatures import SignatureMatcher, load_signatures
+
+def legacy_detect(html, signatures):
+    """Purana detect_app: har keyword ke liye poori HTML par ek substring scan."""
+    h = html.lower()
+    detected = []
+    for name, kws in signatures:
+        for kw in kws:
+            if kw.lower() in h:
+                detected.append(name)
+                break
+    if not detected:
+        return "Unknown"
+    named = [d for d in detected if d != "Native Shopify"]
+    return " + ".join(named) if named else "Native Shopify"
+
+def synthetic_corpus(n, signatures, size=300_000, seed=7):
+    rnd = random.Random(seed)
+    keywords = [kw for _, kws in signatures for kw in kws]
+    alphabet = string.ascii_letters + string.digits + ' <>/="-_.:;{}'
+    base = "".join(rnd.choice(alphabet) for _ in range(size + n * 1000))
+    pages = []
+    for i in range(n):
+        page = base[i * 1000:i * 1000 + size]
+        for kw in rnd.sample(keywords, rnd.randint(0, 4)):
+            pos  = rnd.randint(0, len(page))
+            page = page[:pos] + kw + page[pos:]
+        pages.append(page)
+    return pages
+
+def timeit(fn, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in pages:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "homepages"))
+    ap.add_argument("--synthetic", type=int, default=50, help="corpus khaali ho to itne synthetic pages")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    version, apps = load_signatures()
+    signatures = [(name, [kw for kw, _ in pats]) for name, pats in apps]
+
+    files = sorted(glob.glob(os.path.join(args.corpus, "*.html")))
+    if files:
+        pages = [open(f, encoding="utf-8", errors="replace").read() for f in files]
+        source = f"{len(files)} saved homepages ({args.corpus})"
+    else:
+        pages = synthetic_corpus(args.synthetic, signatures)
+        source = f"{len(pages)} synthetic pages"
+    total_mb = sum(len(p) for p in pages) / 1e6
+    n_kw = sum(len(k) for _, k in signatures)
+    print(f"📚 Corpus: {source}, {total_mb:.1f} MB | signatures v{version}: {len(apps)} apps, {n_kw} keywords")
+
+    matchers = [("legacy substring loop", lambda h: legacy_detect(h, signatures))]
+    compiled = SignatureMatcher(apps, version)
+    matchers.append((f"compiled ({compiled.backend})", compiled.detect))
+    if compiled.backend != "substring":
+        aho, app_signatures.ahocorasick = app_signatures.ahocorasick, None
+        fallback = SignatureMatcher(apps, version)
+        app_signatures.ahocorasick = aho
+        matchers.append(("compiled (substring)", fallback.detect))
+
+    # Sab matchers ka output same hona chahiye
+    expected = [matchers[0][1](p) for p in pages]
+    for name, fn in matchers[1:]:
+        mismatches = sum(1 for p, e in zip(pages, expected) if fn(p) != e)
+        if mismatches:
+            print(f"⚠️  {name}: {mismatches} pages par output alag")
+
+    base = None
+    for name, fn in matchers:
+        secs = timeit(fn, pages, args.repeat)
+        base = base or secs
+        print(f"  {name:28s} {secs * 1000 / len(pages):8.2f} ms/page  {total_mb / secs:7.1f} MB/s  x{base / secs:.2f}")
+
+if __name__ == "__main__":
+    main()
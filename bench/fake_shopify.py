@@ -0,0 +1,208 @@
+"""
+fake_shopify.py - Local stand-in Shopify server (stdlib http.server) benchmarks ke liye
+- Path ka pehla segment store domain hai: http://127.0.0.1:8765/<domain>/products.json
+  (scanner ko STORE_URL_TEMPLATE="http://127.0.0.1:8765/{domain}" do)
+- Har domain ka profile (catalog size, app, subscription ratio, dead / empty / challenge)
+  seed + domain se deterministic
+- Homepage par app_signatures.json ke apps, /products.json pagination,
+  /products/<handle>.js selling_plan_groups ke saath ya bina
+- Injected latency, Retry-After ke saath 429s, Cloudflare-style challenge pages
+- /__stats — ab tak ke requests (bench_scanner.py padhta hai), /__reset
+
+Usage:
+    python bench/fake_shopify.py --port 8765 --catalog-sizes 20,250,1000 --latency-ms 40 --throttle-rate 0.01
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_signatures import load_signatures
+
+CHALLENGE_PAGE = ("<!DOCTYPE html><html><head><title>Just a moment...</title></head>"
+                  "<body><div id='cf-challenge'></div><script>window._cf_chl_opt={}</script></body></html>")
+
+class FakeShopify:
+    def __init__(self, args):
+        self.args   = args
+        self.apps   = [name for name, _ in load_signatures()[1]]
+        self.pats   = {name: [kw for kw, _ in pats] for name, pats in load_signatures()[1]}
+        self.sizes  = [int(x) for x in args.catalog_sizes.split(",")]
+        self.filler = "x" * args.body_bytes
+        self.stats  = Counter()
+        self.lock   = threading.Lock()
+        self._profiles = {}
+
+    def profile(self, domain):
+        p = self._profiles.get(domain)
+        if p is None:
+            a   = self.args
+            rnd = random.Random(f"{a.seed}:{domain}")
+            roll = rnd.random()
+            if roll < a.dead_share:
+                kind = "dead"
+            elif roll < a.dead_share + a.challenge_share:
+                kind = "challenge"
+            elif roll < a.dead_share + a.challenge_share + a.empty_share:
+                kind = "empty"
+            elif rnd.random() < a.sub_share:
+                kind = "subscription"
+            else:
+                kind = "plain"
+            app = self.apps[zlib.crc32(domain.encode()) % len(self.apps)] if kind == "subscription" else None
+            p = {
+                "kind":  kind,
+                "app":   app,
+                "size":  0 if kind == "empty" else rnd.choice(self.sizes),
+                "ratio": rnd.uniform(0.05, 0.5) if kind == "subscription" else 0.0,
+            }
+            self._profiles[domain] = p
+        return p
+
+    def has_sub(self, domain, j, ratio):
+        return (zlib.crc32(f"{domain}:{j}".encode()) % 1000) / 1000 < ratio
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def homepage(self, domain, p):
+        scripts = ""
+        if p["app"]:
+            scripts = "".join(f"<script src='/apps/{kw}.js'></script>" for kw in self.pats[p["app"]][:2])
+        return (f"<!DOCTYPE html><html><head><title>{domain}</title>"
+                f"<link rel='stylesheet' href='//cdn.shopify.com/s/files/theme.css'>{scripts}</head>"
+                f"<body><div class='shopify-section'>{self.filler}</div></body></html>")
+
+    def products_page(self, domain, p, page, limit):
+        lo = (page - 1) * limit
+        hi = min(p["size"], lo + limit)
+        return {"products": [{
+            "id":         j,
+            "handle":     f"p{j}",
+            "title":      f"Product {j}",
+            "updated_at": "2026-01-01T00:00:00Z",
+            "body_html":  self.filler,
+            "variants":   [{"id": j * 10, "price": "19.00"}],
+        } for j in range(lo, hi)]}
+
+    def product_js(self, domain, p, handle):
+        try:
+            j = int(handle.lstrip("p"))
+        except ValueError:
+            return None
+        if j >= p["size"]:
+            return None
+        plans = []
+        if self.has_sub(domain, j, p["ratio"]):
+            plans = [{"name": "Subscribe & Save", "selling_plans": [{"name": "Monthly"}]}]
+        return {"id": j, "handle": handle, "title": f"Product {j}", "price": 1900,
+                "selling_plan_groups": plans}
+
+def make_handler(shop):
+    a = shop.args
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, status, body, ctype="text/html", headers=None):
+            data = body.encode() if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_json(self, obj):
+            self.send(200, json.dumps(obj), "application/json")
+
+        def do_GET(self):
+            url   = urlsplit(self.path)
+            parts = url.path.strip("/").split("/", 1)
+            if parts[0] == "__stats":
+                return self.send_json(dict(shop.stats))
+            if parts[0] == "__reset":
+                shop.stats.clear()
+                return self.send_json({})
+
+            domain = parts[0]
+            rest   = "/" + (parts[1] if len(parts) > 1 else "")
+            p      = shop.profile(domain)
+            shop.count("requests")
+
+            if a.latency_ms:
+                time.sleep(max(0.0, random.gauss(a.latency_ms, a.latency_ms / 3)) / 1000)
+            if p["kind"] == "dead":
+                shop.count("dead")
+                return self.send(404, "Not Found")
+            if p["kind"] == "challenge":
+                shop.count("challenge")
+                return self.send(503, CHALLENGE_PAGE, headers={"cf-mitigated": "challenge"})
+            if a.throttle_rate and random.random() < a.throttle_rate:
+                shop.count("throttled")
+                return self.send(429, "Too Many Requests", headers={"Retry-After": str(a.retry_after)})
+
+            if rest == "/":
+                shop.count("homepage")
+                return self.send(200, shop.homepage(domain, p), headers={"x-shopid": str(zlib.crc32(domain.encode()))})
+            if rest == "/products.json":
+                shop.count("products_json")
+                q = parse_qs(url.query)
+                page  = int(q.get("page", ["1"])[0])
+                limit = min(int(q.get("limit", ["30"])[0]), 250)
+                return self.send_json(shop.products_page(domain, p, page, limit))
+            if rest.startswith("/products/") and rest.endswith(".js"):
+                shop.count("product_js")
+                data = shop.product_js(domain, p, rest[len("/products/"):-3])
+                if data is None:
+                    return self.send(404, "Not Found")
+                return self.send_json(data)
+            return self.send(404, "Not Found")
+
+    return Handler
+
+def add_server_args(ap):
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--catalog-sizes", default="20,120,250,600,1500", help="har store inme se ek size")
+    ap.add_argument("--sub-share", type=float, default=0.4, help="subscription app waale stores")
+    ap.add_argument("--empty-share", type=float, default=0.05, help="products.json khaali")
+    ap.add_argument("--dead-share", type=float, default=0.05, help="homepage 404")
+    ap.add_argument("--challenge-share", type=float, default=0.0,
+                    help="Cloudflare challenge (browser tier chahiye — Chromium installed ho tab)")
+    ap.add_argument("--latency-ms", type=float, default=30.0)
+    ap.add_argument("--throttle-rate", type=float, default=0.01, help="har request par 429 ki probability")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--body-bytes", type=int, default=2000, help="body_html / homepage filler")
+    return ap
+
+def main():
+    args = add_server_args(argparse.ArgumentParser(description="Fake Shopify store server")).parse_args()
+    shop = FakeShopify(args)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(shop))
+    server.daemon_threads = True
+    print(f"🛍️  Fake Shopify on http://127.0.0.1:{args.port}/<domain>", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,155 @@
 """
 merge_chunks.py - Jo bhi chunks mile unhe merge karo (missing chunks skip)
+- Chunk manifests (*.manifest.json) se chunk count + domain ranges
+- shard_manifest.json (shard_planner.py) mile to shard count + missing shards ke stores usi se
+- JSONL shards parallel mein padhe jaate hain (purane .xlsx chunks ka fallback)
+- Store_Summary vectorized groupby se
+- Excel optional final export (write-only / streaming workbook)
 """
 
 import os
+import re
 import glob
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils import get_column_letter
+from result_store import chunk_range, merge_fingerprints, merge_result_caches
+from shard_planner import load_shard_manifest
 
 OUTPUT_FILE = "FINAL_Shopify_Deep_Analysis.xlsx"
+OUTPUT_BASE = os.path.splitext(OUTPUT_FILE)[0]
+CHUNK_TOTAL = int(os.getenv("CHUNK_TOTAL", "20"))   # manifest na mile tab ka default
+FINGERPRINTS_FILE = "fingerprints.db"               # agle delta run ka seed
+RESULT_CACHE_FILE = "result_cache.db"               # agle run ka cross-run result cache
 
 def write_sheet(wb, df_data, sheet_name, header_color="1F4E79"):
+    """Write-only sheet: sirf header styled, widths pandas se ek baar mein."""
     if df_data.empty:
         return
     ws = wb.create_sheet(sheet_name)
-    for r in dataframe_to_rows(df_data, index=False, header=True):
-        ws.append(r)
+    lengths = df_data.astype(str).apply(lambda col: col.str.len().max())
+    for i, col in enumerate(df_data.columns, start=1):
+        max_len = max(len(str(col)), int(lengths[col]) if pd.notna(lengths[col]) else 0)
+        ws.column_dimensions[get_column_letter(i)].width = min(max_len + 4, 60)
+
     header_fill = PatternFill("solid", start_color=header_color)
     header_font = Font(bold=True, color="FFFFFF", name="Arial", size=10)
-    for cell in ws[1]:
+    header = []
+    for col in df_data.columns:
+        cell = WriteOnlyCell(ws, value=str(col))
         cell.fill = header_fill
         cell.font = header_font
         cell.alignment = Alignment(horizontal="center", vertical="center")
-    for col in ws.columns:
-        max_len = max((len(str(cell.value or "")) for cell in col), default=10)
-        ws.column_dimensions[col[0].column_letter].width = min(max_len + 4, 60)
-    for row in ws.iter_rows(min_row=2):
-        for cell in row:
-            cell.font = Font(name="Arial", size=9)
+        header.append(cell)
+    ws.append(header)
 
-def main():
-    # Har jagah se files dhundo
+    clean = df_data.astype(object).where(df_data.notna(), None)
+    for row in clean.itertuples(index=False, name=None):
+        ws.append(row)
+
+def find_files(pattern):
+    """Har jagah se files dhundo."""
     search_paths = [
-        "./chunks/output_chunk_*.xlsx",
-        "./output_chunk_*.xlsx",
-        "./**/output_chunk_*.xlsx",
-        "./chunks/**/output_chunk_*.xlsx",
+        f"./chunks/{pattern}",
+        f"./{pattern}",
+        f"./**/{pattern}",
+        f"./chunks/**/{pattern}",
     ]
+    files = set()
+    for p in search_paths:
+        files.update(glob.glob(p, recursive=True))
+    return sorted(files)
+
+def chunk_index_from_name(path):
+    m = re.search(r"chunk[_-](\d+)", os.path.basename(path))
+    return int(m.group(1)) if m else None
+
+def read_jsonl(path):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return pd.DataFrame()
+    return pd.read_json(path, lines=True, dtype=False)
+
+def load_chunk(spec):
+    """Ek chunk padho (worker process mein) → (index, products_df, status_df, source)."""
+    if spec["kind"] == "shards":
+        return spec["index"], read_jsonl(spec["products"]), read_jsonl(spec["status"]), "jsonl"
+    # Purana .xlsx chunk: dono sheets ek hi read mein
+    try:
+        sheets = pd.read_excel(spec["path"], sheet_name=None)
+    except Exception:
+        return spec["index"], pd.DataFrame(), pd.DataFrame(), "xlsx (unreadable)"
+    return (spec["index"], sheets.get("Subscription_Products", pd.DataFrame()),
+            sheets.get("Status_Log", pd.DataFrame()), "xlsx")
+
+def discover_chunks():
+    """Manifests + legacy xlsx → ({index: spec}, manifests)"""
+    specs, manifests = {}, {}
+    for path in find_files("*.manifest.json"):
+        try:
+            with open(path, encoding="utf-8") as f:
+                m = json.load(f)
+        except Exception:
+            continue
+        idx  = m.get("chunk_index", chunk_index_from_name(path))
+        base = os.path.dirname(path)
+        manifests[idx] = m
+        specs[idx] = {
+            "kind":     "shards",
+            "index":    idx,
+            "products": os.path.join(base, m["shards"]["products"]),
+            "status":   os.path.join(base, m["shards"]["status"]),
+        }
 
-    files = []
-    for pattern in search_paths:
-        found = glob.glob(pattern, recursive=True)
-        files.extend(found)
+    xlsx = [f for f in find_files("*.xlsx") if "chunk" in os.path.basename(f).lower()]
+    for path in xlsx:
+        idx = chunk_index_from_name(path)
+        if idx is not None and idx not in specs:
+            specs[idx] = {"kind": "xlsx", "index": idx, "path": path}
+    return specs, manifests
 
-    # Duplicates remove karo
-    files = list(set(files))
+def build_summary(df_all):
+    """Store_Summary — Python loop ki jagah groupby aggregations."""
+    g = df_all.groupby("Store", sort=True)
+    summary = g.agg(Total_SKUs=("Total_SKUs", "first"), Subscription_Products=("Store", "size"))
+    summary["Ratio"] = summary["Subscription_Products"].astype(str) + "/" + summary["Total_SKUs"].astype(str)
+    # sampled / adaptive scans ka estimate; purane chunks (full scan) mein count hi estimate hai
+    for col in ("Est_Subscription_Products", "CI_Low", "CI_High"):
+        est = g[col].first() if col in df_all else None
+        summary[col] = summary["Subscription_Products"] if est is None else est.fillna(summary["Subscription_Products"])
+    summary["Scan_Mode"] = g["Scan_Mode"].first().fillna("full") if "Scan_Mode" in df_all else "full"
 
-    if not files:
-        # Last resort — saari xlsx files dhundo
-        files = glob.glob("./**/*.xlsx", recursive=True)
-        files = [f for f in files if "chunk" in f.lower()]
+    plans = (df_all[["Store", "Sub_Plans"]].astype({"Sub_Plans": str})
+             .drop_duplicates().groupby("Store").head(5)
+             .groupby("Store")["Sub_Plans"].agg(" | ".join))
+    names = (df_all[["Store", "Product_Title"]].astype({"Product_Title": str})
+             .groupby("Store").head(10)
+             .groupby("Store")["Product_Title"].agg(" | ".join))
+    summary["Plan_Names"]    = plans
+    summary["Product_Names"] = names
+    return summary.reset_index()
 
-    files = sorted(files)
-    print(f"📦 Found {len(files)} chunk files:", flush=True)
-    for f in files:
-        print(f"   {f}", flush=True)
+def parse_args():
+    ap = argparse.ArgumentParser(description="Merge scanner chunks")
+    ap.add_argument("--no-excel", action="store_true", default=os.getenv("MERGE_EXCEL", "1") != "1",
+                    help="sirf merged JSONL likho, Excel export skip")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    return ap.parse_args()
 
-    if not files:
+def main():
+    args = parse_args()
+    specs, manifests = discover_chunks()
+
+    print(f"📦 Found {len(specs)} chunks ({len(manifests)} with manifest):", flush=True)
+    for idx in sorted(specs):
+        spec = specs[idx]
+        print(f"   chunk-{idx}: {spec.get('path') or spec['status']}", flush=True)
+
+    if not specs:
         print("❌ Koi chunk file nahi mili!", flush=True)
         # Empty file banao taaki artifact upload fail na ho
         wb = Workbook()
@@ -66,88 +158,108 @@ def main():
         wb.save(OUTPUT_FILE)
         return
 
-    # ── Saare chunks read karo ────────────────────────────
+    plan_files  = find_files("shard_manifest.json")
+    plan        = load_shard_manifest(plan_files[0]) if plan_files else None
+    chunk_total = max((m.get("chunk_total", 0) for m in manifests.values()), default=0) or CHUNK_TOTAL
+    if plan:
+        chunk_total = plan["shard_total"]
+        print(f"📐 Shard plan: {plan_files[0]} ({chunk_total} shards)", flush=True)
+    input_total = max((m.get("input_total", 0) for m in manifests.values()), default=0)
+
+    # ── Saare chunks parallel mein read karo ───────────────
     all_dfs        = []
     all_status_dfs = []
-    missing_chunks = []
+    missing_chunks = [i for i in range(chunk_total) if i not in specs]
 
-    for i in range(20):  # 0 to 19
-        chunk_file = next((f for f in files if f"chunk_{i}" in f or f"chunk-{i}" in f), None)
-        if not chunk_file:
-            missing_chunks.append(i)
-            print(f"  ⚠️  chunk-{i}: MISSING", flush=True)
-            continue
-        try:
-            df = pd.read_excel(chunk_file, sheet_name="Subscription_Products")
-            all_dfs.append(df)
-            print(f"  ✅ chunk-{i}: {len(df)} subscription products", flush=True)
-        except Exception:
-            # Sheet nahi hai matlab koi subscription nahi mili us chunk mein
-            print(f"  ℹ️  chunk-{i}: No subscription products sheet", flush=True)
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(specs)))) as pool:
+        loaded = sorted(pool.map(load_chunk, specs.values()), key=lambda x: x[0])
 
-        try:
-            df_log = pd.read_excel(chunk_file, sheet_name="Status_Log")
+    for idx, df, df_log, source in loaded:
+        if not df.empty:
+            all_dfs.append(df)
+            print(f"  ✅ chunk-{idx}: {len(df)} subscription products ({source})", flush=True)
+        else:
+            print(f"  ℹ️  chunk-{idx}: No subscription products ({source})", flush=True)
+        if not df_log.empty:
             all_status_dfs.append(df_log)
-        except Exception:
-            pass
+        m = manifests.get(idx)
+        if m and not m.get("finished", True):
+            print(f"  ⚠️  chunk-{idx}: run poora nahi hua (partial shards)", flush=True)
 
+    for idx in missing_chunks:
+        print(f"  ⚠️  chunk-{idx}: MISSING", flush=True)
     if missing_chunks:
         print(f"\n⚠️  Missing chunks: {missing_chunks}", flush=True)
         print(f"   In stores ka data nahi aaya. Dobara run karo agar chahiye.\n", flush=True)
 
     # ── Merge karo ───────────────────────────────────────
-    wb = Workbook()
-    if "Sheet" in wb.sheetnames:
-        del wb["Sheet"]
-
+    df_all = df_summary = df_log_all = df_status_summary = None
     if all_dfs:
         df_all = pd.concat(all_dfs, ignore_index=True)
+        if "Product_Link" in df_all:
+            # --resume se same product do baar aa sakta hai
+            df_all = df_all.drop_duplicates(subset=["Store", "Product_Link"], keep="last")
         print(f"\n📊 Total subscription products: {len(df_all)}", flush=True)
-
-        # Store summary
-        summary = []
-        for store, grp in df_all.groupby("Store"):
-            summary.append({
-                "Store":                 store,
-                "Total_SKUs":            grp["Total_SKUs"].iloc[0],
-                "Subscription_Products": len(grp),
-                "Ratio":                 f"{len(grp)}/{grp['Total_SKUs'].iloc[0]}",
-                "Plan_Names":            " | ".join(grp["Sub_Plans"].unique()[:5]),
-                "Product_Names":         " | ".join(grp["Product_Title"].tolist()[:10])
-            })
-        df_summary = pd.DataFrame(summary)
+        df_summary = build_summary(df_all)
         print(f"🏪 Total subscription stores: {len(df_summary)}", flush=True)
-
-        write_sheet(wb, df_all,     "All_Subscription_Products", "1F4E79")
-        write_sheet(wb, df_summary, "Store_Summary",              "375623")
+        df_all.to_json(OUTPUT_BASE + ".products.jsonl", orient="records", lines=True, force_ascii=False)
     else:
         print("\n⚠️  Kisi bhi chunk mein subscription products nahi mili", flush=True)
-        ws = wb.create_sheet("No_Data")
-        ws['A1'] = "No subscription products found in any chunk"
 
     # Status log merge
     if all_status_dfs:
         df_log_all = pd.concat(all_status_dfs, ignore_index=True)
-        write_sheet(wb, df_log_all, "Status_Log", "843C0C")
+        df_log_all = df_log_all.drop_duplicates(subset=["Domain"], keep="last")
+        df_log_all.to_json(OUTPUT_BASE + ".status.jsonl", orient="records", lines=True, force_ascii=False)
 
         # Status summary
         df_status_summary = df_log_all["Status"].value_counts().reset_index()
         df_status_summary.columns = ["Status", "Count"]
-        write_sheet(wb, df_status_summary, "Status_Summary", "595959")
 
         print(f"\n─── FINAL STATUS SUMMARY ───", flush=True)
         print(df_status_summary.to_string(index=False), flush=True)
 
-    # Missing chunks info
+    # Delta fingerprints: saare chunks ke snapshots ek file mein
+    fp_files = find_files("*.fp.db")
+    if fp_files:
+        merge_fingerprints(FINGERPRINTS_FILE, fp_files)
+        print(f"🔁 Fingerprints merged: {len(fp_files)} files → {FINGERPRINTS_FILE}", flush=True)
+
+    # Result cache: har chunk ka cache pichhle run ke cache se seeded hai; merge + expired evict
+    cache_files = find_files("*.cache.db")
+    if cache_files:
+        merge_result_caches(RESULT_CACHE_FILE, cache_files)
+        print(f"🗄️  Result cache merged: {len(cache_files)} files → {RESULT_CACHE_FILE}", flush=True)
+
+    if args.no_excel:
+        print(f"\n✅ Saved: {OUTPUT_BASE}.products.jsonl / .status.jsonl (Excel skipped)", flush=True)
+        return
+
+    wb = Workbook(write_only=True)
+    if df_all is not None:
+        write_sheet(wb, df_all,     "All_Subscription_Products", "1F4E79")
+        write_sheet(wb, df_summary, "Store_Summary",              "375623")
+    else:
+        ws = wb.create_sheet("No_Data")
+        ws.append(["No subscription products found in any chunk"])
+    if df_log_all is not None:
+        write_sheet(wb, df_log_all,        "Status_Log",     "843C0C")
+        write_sheet(wb, df_status_summary, "Status_Summary", "595959")
+
+    # Missing chunks info (shard plan ke domains, warna manifest ke input_total se ranges)
     if missing_chunks:
         ws_missing = wb.create_sheet("Missing_Chunks")
-        ws_missing['A1'] = "Missing Chunk Numbers"
-        ws_missing['B1'] = "Stores Range"
-        for row, chunk_num in enumerate(missing_chunks, start=2):
-            start = chunk_num * (6600 // 20)
-            end   = start + (6600 // 20)
-            ws_missing.cell(row=row, column=1, value=f"chunk-{chunk_num}")
-            ws_missing.cell(row=row, column=2, value=f"{start}–{end}")
+        ws_missing.append(["Missing Chunk Numbers", "Stores Range"])
+        for chunk_num in missing_chunks:
+            if plan:
+                shard = plan["shards"][chunk_num]
+                ws_missing.append([f"chunk-{chunk_num}",
+                                   f"{len(shard['domains'])} planned stores (est. {shard['est_cost_s'] / 60:.0f} min)"])
+            elif input_total:
+                start, end = chunk_range(input_total, chunk_total, chunk_num)
+                ws_missing.append([f"chunk-{chunk_num}", f"{start}–{end}"])
+            else:
+                ws_missing.append([f"chunk-{chunk_num}", "unknown (no manifest)"])
 
     wb.save(OUTPUT_FILE)
     print(f"\n✅ Saved: {OUTPUT_FILE}", flush=True)
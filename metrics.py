@@ -0,0 +1,159 @@
+"""
+metrics.py - Per-store stage instrumentation
+- StoreTrace: har stage (homepage, detect_app, products.json pages, pre-check, full scan, close)
+  ka duration + requests / bytes / retries / 429s
+- Requests contextvar se stage par attribute hote hain, isliye concurrent pagination aur
+  product checks ek doosre ke counters mein nahi milte
+- TraceWriter: <output>.trace.jsonl (ek line per store)
+- profile_tables: slowest stores / slowest stages / per-stage p50-p95-p99 (Profile sheet)
+- LiveMetrics: optional METRICS_PORT par Prometheus-style text endpoint
+"""
+
+import re
+import json
+import time
+import asyncio
+import contextvars
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+
+CURRENT_STAGE = contextvars.ContextVar("current_stage", default=None)
+
+STAGE_FIELDS = ("requests", "bytes", "retries", "throttled")
+
+def count(field, n=1):
+    """Jo stage is task mein chal raha hai uske counter mein jodo."""
+    st = CURRENT_STAGE.get()
+    if st is not None:
+        st[field] += n
+
+def stage_group(name):
+    """'products.json p12' → 'products.json page' (aggregation ke liye)."""
+    return re.sub(r" p\d+$", " page", name)
+
+class StoreTrace:
+    def __init__(self, domain):
+        self.domain = domain
+        self.t0     = time.time()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        st = {"stage": name, "start_s": round(time.time() - self.t0, 3), "duration_s": 0.0}
+        st.update({f: 0 for f in STAGE_FIELDS})
+        token = CURRENT_STAGE.set(st)
+        t = time.perf_counter()
+        try:
+            yield st
+        finally:
+            st["duration_s"] = round(time.perf_counter() - t, 3)
+            CURRENT_STAGE.reset(token)
+            self.stages.append(st)
+
+class TraceWriter:
+    """Append-only <base>.trace.jsonl — {domain, status, elapsed_s, stages: [...]} per store."""
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self._f   = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, r):
+        self._f.write(json.dumps({"domain": r["domain"], "status": r["status"], "elapsed_s": r.get("elapsed"),
+                                  "stages": r.get("stages", [])}, default=str) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+def read_traces(path):
+    traces = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    continue    # adhoori aakhri line (killed run)
+    except OSError:
+        pass
+    return traces
+
+def profile_tables(traces, top=25):
+    """→ (slowest_stores, stage_percentiles, slowest_stages) DataFrames."""
+    import pandas as pd
+
+    stores = pd.DataFrame([{
+        "Domain": t["domain"], "Status": t["status"], "Elapsed_s": t.get("elapsed_s"),
+        "Stages": len(t["stages"]),
+        "Slowest_Stage": max(t["stages"], key=lambda s: s["duration_s"])["stage"] if t["stages"] else "",
+        "Slowest_Stage_s": max((s["duration_s"] for s in t["stages"]), default=0),
+        "Requests": sum(s["requests"] for s in t["stages"]),
+    } for t in traces])
+    stages = pd.DataFrame([dict(s, domain=t["domain"]) for t in traces for s in t["stages"]])
+    if stores.empty or stages.empty:
+        return stores, stages, stages
+
+    slowest_stores = stores.sort_values("Elapsed_s", ascending=False).head(top)
+    stages["group"] = stages["stage"].map(stage_group)
+    g = stages.groupby("group")["duration_s"]
+    pct = pd.DataFrame({
+        "Count":   g.size(),
+        "Total_s": g.sum().round(1),
+        "p50_s":   g.quantile(0.50).round(3),
+        "p95_s":   g.quantile(0.95).round(3),
+        "p99_s":   g.quantile(0.99).round(3),
+        "Max_s":   g.max(),
+    })
+    for f in STAGE_FIELDS:
+        pct[f.capitalize()] = stages.groupby("group")[f].sum()
+    pct = pct.sort_values("Total_s", ascending=False).reset_index().rename(columns={"group": "Stage"})
+    slowest_stages = (stages.sort_values("duration_s", ascending=False).head(top)
+                      [["domain", "stage", "start_s", "duration_s", *STAGE_FIELDS]])
+    return slowest_stores, pct, slowest_stages
+
+class LiveMetrics:
+    """Chalte run ke counters; METRICS_PORT par text/plain (Prometheus exposition) serve."""
+
+    def __init__(self, window=1000):
+        self.t0        = time.time()
+        self.in_flight = 0
+        self.statuses  = Counter()
+        self.totals    = Counter()
+        self.recent    = defaultdict(lambda: deque(maxlen=window))   # stage group → durations
+
+    def observe(self, r):
+        self.statuses[r["status"]] += 1
+        for s in r.get("stages", []):
+            self.recent[stage_group(s["stage"])].append(s["duration_s"])
+            for f in STAGE_FIELDS:
+                self.totals[f] += s[f]
+
+    def render(self):
+        done  = sum(self.statuses.values())
+        lines = [
+            f"scanner_uptime_seconds {time.time() - self.t0:.0f}",
+            f"scanner_stores_in_flight {self.in_flight}",
+            f"scanner_stores_done {done}",
+            f"scanner_stores_per_minute {done / max((time.time() - self.t0) / 60, 1e-9):.2f}",
+        ]
+        lines += [f'scanner_stores_total{{status="{s}"}} {n}' for s, n in sorted(self.statuses.items())]
+        lines += [f"scanner_{f}_total {self.totals[f]}" for f in STAGE_FIELDS]
+        for name, durations in sorted(self.recent.items()):
+            ds = sorted(durations)
+            for q in (0.5, 0.95, 0.99):
+                v = ds[min(len(ds) - 1, int(q * len(ds)))]
+                lines.append(f'scanner_stage_seconds{{stage="{name}",quantile="{q}"}} {v}')
+        return "\n".join(lines) + "\n"
+
+    async def handle(self, reader, writer):
+        try:
+            await reader.readline()    # request line; path ki parwah nahi
+            body = self.render().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         b"Content-Length: " + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, port):
+        return await asyncio.start_server(self.handle, "0.0.0.0", port)
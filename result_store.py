@@ -0,0 +1,357 @@
+"""
+result_store.py - Crash-safe per-domain result store (SQLite, WAL mode)
+- Har store khatam hote hi uska status + rows commit ho jaate hain
+- Runner beech mein mar jaaye to --resume sirf failed / timed-out domains dobara chalata hai
+- Excel / summary isi store se banta hai
+- Saath mein append-only JSONL shards + chunk manifest (merge_chunks.py ke liye)
+- Delta re-scan ke liye catalog fingerprints (FingerprintStore)
+- Cross-run TTL result cache (ResultCache) — pichhle runs ke verdicts, per-status TTL
+"""
+
+import json
+import os
+import shutil
+import hashlib
+import sqlite3
+import time
+
+# Ye statuses dobara try karne layak hain (network / rate-limit / timeout)
+RETRYABLE_STATUSES = {"timeout", "error", "blocked_timeout", "blocked_0", "blocked_429", "triage_unreachable",
+                      "preempted", "deferred"}
+
+def normalize_domain(domain):
+    """'https://Foo.com/path' → 'foo.com' (saare stores / manifests is key se)"""
+    domain = str(domain).strip().lower()
+    return domain.replace("https://","").replace("http://","").split('/')[0]
+
+def is_terminal(status):
+    """found / no_subscription / blocked_403 jaise final verdicts — resume par skip."""
+    if status in RETRYABLE_STATUSES:
+        return False
+    if status.startswith("blocked_"):
+        code = status[len("blocked_"):]
+        # blocked_5xx aur blocked_<exception text> retry, blocked_4xx final
+        return code.isdigit() and 400 <= int(code) < 500
+    return True
+
+class ResultStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                domain     TEXT PRIMARY KEY,
+                status     TEXT NOT NULL,
+                log        TEXT NOT NULL,
+                rows       TEXT NOT NULL,
+                attempts   INTEGER NOT NULL DEFAULT 1,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def put(self, log, rows):
+        """Ek domain ka Status_Log row + product rows durable likho (upsert)."""
+        self.conn.execute("""
+            INSERT INTO results (domain, status, log, rows, attempts, updated_at)
+            VALUES (?, ?, ?, ?, 1, ?)
+            ON CONFLICT(domain) DO UPDATE SET
+                status=excluded.status, log=excluded.log, rows=excluded.rows,
+                attempts=results.attempts + 1, updated_at=excluded.updated_at
+        """, (log["Domain"], log["Status"], json.dumps(log, default=str),
+              json.dumps(rows, default=str), time.time()))
+        self.conn.commit()
+
+    def statuses(self):
+        return dict(self.conn.execute("SELECT domain, status FROM results"))
+
+    def done_domains(self):
+        """Terminal status waale domains (resume par skip)."""
+        return {d for d, s in self.statuses().items() if is_terminal(s)}
+
+    def get(self, domain):
+        """→ (log, rows) ya None."""
+        row = self.conn.execute("SELECT log, rows FROM results WHERE domain = ?", (domain,)).fetchone()
+        return (json.loads(row[0]), json.loads(row[1])) if row else None
+
+    def status_log(self):
+        return [json.loads(log) for (log,) in self.conn.execute("SELECT log FROM results ORDER BY rowid")]
+
+    def rows(self):
+        out = []
+        for (rows,) in self.conn.execute("SELECT rows FROM results ORDER BY rowid"):
+            out.extend(json.loads(rows))
+        return out
+
+    def reset(self):
+        self.conn.execute("DELETE FROM results")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+class ShardWriter:
+    """
+    Append-only JSONL shards (merge_chunks.py inhe padhta hai):
+      <base>.products.jsonl — Subscription_Products rows
+      <base>.status.jsonl   — Status_Log rows
+    Har domain ke baad flush, isliye adhoore run ke shards bhi valid hain.
+    """
+
+    def __init__(self, base, append=False):
+        self.products_path = base + ".products.jsonl"
+        self.status_path   = base + ".status.jsonl"
+        mode = "a" if append else "w"
+        self._products = open(self.products_path, mode, encoding="utf-8")
+        self._status   = open(self.status_path, mode, encoding="utf-8")
+
+    def write(self, log, rows):
+        for row in rows:
+            self._products.write(json.dumps(row, default=str) + "\n")
+        self._status.write(json.dumps(log, default=str) + "\n")
+        self._products.flush()
+        self._status.flush()
+
+    def close(self):
+        self._products.close()
+        self._status.close()
+
+def chunk_range(total, chunk_total, chunk_index):
+    """Contiguous chunk ki (start, end) — scanner aur merger dono yahi formula use karte hain."""
+    if chunk_total <= 1:
+        return 0, total
+    chunk_size = total // chunk_total
+    start = chunk_index * chunk_size
+    end   = start + chunk_size if chunk_index < chunk_total - 1 else total
+    return start, end
+
+def write_manifest(base, **fields):
+    """<base>.manifest.json — chunk ka index/total, domain range aur shard files."""
+    path = base + ".manifest.json"
+    doc = {"version": 1, "updated_at": time.time()}
+    doc.update(fields)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+def product_key(product_id, updated_at):
+    return f"{product_id}:{updated_at}"
+
+class CatalogFingerprint:
+    """Order-independent catalog fingerprint: har product ke (id, updated_at) hash ka XOR + count.
+    Incremental hai, isliye pagination stream karte hue hi ban jaata hai."""
+
+    def __init__(self):
+        self.acc = 0
+        self.n   = 0
+
+    def add(self, key):
+        self.acc ^= int(hashlib.sha1(key.encode()).hexdigest()[:16], 16)
+        self.n   += 1
+
+    def hexdigest(self):
+        return f"{self.n}:{self.acc:016x}"
+
+class FingerprintStore:
+    """
+    Delta re-scan ke liye pichhle run ke catalogs (SQLite):
+      catalogs — domain → catalog fingerprint, status, app
+      products — (domain, handle) → id:updated_at, has_sub, subscription row
+    `seed` (pichhle run ka merged file) se pehli baar copy hota hai, phir isi file mein updates.
+    """
+
+    def __init__(self, path, seed=None):
+        self.path = path
+        if seed and os.path.exists(seed) and not os.path.exists(path):
+            shutil.copyfile(seed, path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS catalogs (
+                domain      TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                status      TEXT NOT NULL,
+                app         TEXT,
+                total_skus  INTEGER,
+                scanned_at  REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS products (
+                domain  TEXT NOT NULL,
+                handle  TEXT NOT NULL,
+                key     TEXT,
+                has_sub INTEGER,
+                row     TEXT,
+                PRIMARY KEY (domain, handle)
+            );
+        """)
+        self.conn.commit()
+
+    def load(self, domain):
+        """Pichhla snapshot → {"fingerprint", "status", "app", "products": {handle: (key, has_sub, row)}} ya None"""
+        cat = self.conn.execute(
+            "SELECT fingerprint, status, app, total_skus FROM catalogs WHERE domain=?", (domain,)).fetchone()
+        if cat is None:
+            return None
+        products = {}
+        for handle, key, has_sub, row in self.conn.execute(
+                "SELECT handle, key, has_sub, row FROM products WHERE domain=?", (domain,)):
+            products[handle] = (key, None if has_sub is None else bool(has_sub), json.loads(row) if row else None)
+        return {"fingerprint": cat[0], "status": cat[1], "app": cat[2], "total_skus": cat[3], "products": products}
+
+    def save(self, domain, fingerprint, status, app, total_skus, products):
+        """products: [(handle, key, has_sub, row)] — domain ka poora snapshot replace."""
+        with self.conn:
+            self.conn.execute("DELETE FROM products WHERE domain=?", (domain,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO products (domain, handle, key, has_sub, row) VALUES (?, ?, ?, ?, ?)",
+                [(domain, h, k, None if s is None else int(s), json.dumps(r, default=str) if r else None)
+                 for h, k, s, r in products])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO catalogs (domain, fingerprint, status, app, total_skus, scanned_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (domain, fingerprint, status, app, total_skus, time.time()))
+
+    def close(self):
+        self.conn.close()
+
+def merge_fingerprints(out_path, paths):
+    """Chunks ke fingerprint DBs → ek file; har domain ka sabse naya snapshot jeetta hai."""
+    out = FingerprintStore(out_path)
+    for path in paths:
+        if os.path.abspath(path) == os.path.abspath(out_path):
+            continue
+        out.conn.execute("ATTACH DATABASE ? AS src", (path,))
+        with out.conn:
+            newer = """SELECT s.domain FROM src.catalogs s LEFT JOIN main.catalogs m ON m.domain = s.domain
+                       WHERE m.domain IS NULL OR s.scanned_at > m.scanned_at"""
+            out.conn.execute(f"CREATE TEMP TABLE newer AS {newer}")
+            out.conn.execute("DELETE FROM main.products WHERE domain IN (SELECT domain FROM newer)")
+            out.conn.execute("""INSERT INTO main.products SELECT * FROM src.products
+                                WHERE domain IN (SELECT domain FROM newer)""")
+            out.conn.execute("""INSERT OR REPLACE INTO main.catalogs SELECT * FROM src.catalogs
+                                WHERE domain IN (SELECT domain FROM newer)""")
+            out.conn.execute("DROP TABLE newer")
+        out.conn.execute("DETACH DATABASE src")
+    out.close()
+
+# Cache TTLs (hours) — final verdicts lambe, network / rate-limit failures chhote
+CACHE_TTL_HOURS = {
+    "no_products":              24 * 14,
+    "no_subscription":          24 * 7,
+    "app_detected_no_products": 24 * 3,
+    "found":                    24,
+    "skipped":                  24 * 30,
+    "triage_dns_failed":        24 * 3,
+    "triage_not_shopify":       24 * 14,
+    "triage_duplicate":         24 * 7,
+    "triage_invalid":           24 * 30,
+    "triage_unreachable":       6,
+    "blocked_timeout":          6,
+    "timeout":                  6,
+    "blocked_429":              1,
+    "error":                    1,
+    "preempted":                0,    # adhoora scan — cursor se resume, cache se kabhi nahi
+    "deferred":                 0,
+}
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "200000"))
+
+def cache_ttl(status):
+    """Status → TTL hours. blocked_4xx final jaisa (3 din), baaki blocked_* chhota."""
+    if status in CACHE_TTL_HOURS:
+        return CACHE_TTL_HOURS[status]
+    if status.startswith("blocked_"):
+        return 24 * 3 if is_terminal(status) else 6
+    return 24
+
+def cache_key(domain):
+    """Content address: normalized domain ka sha1 (scheme / path / case se farak nahi padta)."""
+    return hashlib.sha1(normalize_domain(domain).encode()).hexdigest()
+
+class ResultCache:
+    """
+    Cross-run result cache (ek portable SQLite file, workflow runs ke beech actions/cache se):
+      key (sha1 of normalized domain) → status, app, Status_Log row, product rows, scanned_at
+    get() per-status TTL (aur optional max_age) se fresh entry hi deta hai; evict() expired
+    entries hataata hai aur file ko CACHE_MAX_ENTRIES tak rakhta hai (sabse purane pehle).
+    """
+
+    def __init__(self, path, seed=None, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        if seed and os.path.exists(seed) and not os.path.exists(path):
+            shutil.copyfile(seed, path)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key        TEXT PRIMARY KEY,
+                domain     TEXT NOT NULL,
+                status     TEXT NOT NULL,
+                app        TEXT,
+                log        TEXT NOT NULL,
+                rows       TEXT NOT NULL,
+                scanned_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, domain, max_age_h=None):
+        """Fresh entry → (log, rows, age_hours), warna None."""
+        hit = self.conn.execute("SELECT status, log, rows, scanned_at FROM cache WHERE key=?",
+                                (cache_key(domain),)).fetchone()
+        if hit is None:
+            return None
+        status, log, rows, scanned_at = hit
+        age_h = (time.time() - scanned_at) / 3600
+        limit = cache_ttl(status) if max_age_h is None else min(cache_ttl(status), max_age_h)
+        if age_h > limit:
+            return None
+        return json.loads(log), json.loads(rows), age_h
+
+    def put(self, log, rows):
+        app = rows[0].get("Subscription_App") if rows else None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache (key, domain, status, app, log, rows, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (cache_key(log["Domain"]), normalize_domain(log["Domain"]), log["Status"], app,
+             json.dumps(log, default=str), json.dumps(rows, default=str), time.time()))
+        self.conn.commit()
+
+    def evict(self):
+        """Expired entries + max_entries se upar ke sabse purane → deleted count."""
+        now = time.time()
+        deleted = 0
+        with self.conn:
+            for status, in self.conn.execute("SELECT DISTINCT status FROM cache").fetchall():
+                deleted += self.conn.execute("DELETE FROM cache WHERE status=? AND scanned_at < ?",
+                                             (status, now - cache_ttl(status) * 3600)).rowcount
+            deleted += self.conn.execute("""
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY scanned_at DESC LIMIT -1 OFFSET ?)""",
+                (self.max_entries,)).rowcount
+        return deleted
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+def merge_result_caches(out_path, paths):
+    """Chunks ke cache files → ek file; har domain ki sabse nayi entry jeetti hai."""
+    out = ResultCache(out_path)
+    for path in paths:
+        if os.path.abspath(path) == os.path.abspath(out_path):
+            continue
+        out.conn.execute("ATTACH DATABASE ? AS src", (path,))
+        with out.conn:
+            out.conn.execute("""INSERT OR REPLACE INTO main.cache SELECT s.* FROM src.cache s
+                                LEFT JOIN main.cache m ON m.key = s.key
+                                WHERE m.key IS NULL OR s.scanned_at > m.scanned_at""")
+        out.conn.execute("DETACH DATABASE src")
+    out.evict()
+    out.close()
@@ -0,0 +1,181 @@
+"""
+shard_planner.py - Cost-aware shard planner (contiguous CHUNK_INDEX slicing ki jagah)
+- Pichhle runs ke Status_Log / products (Elapsed_s, Status, Total_SKUs) se har domain ki cost estimate
+- history/result_cache.db mein fresh verdict waale domains scan hi nahi honge → cost ~0
+- Longest-processing-time (LPT) bin-packing: sabse mehenge stores pehle, sabse halke shard mein
+- shard_manifest.json likhta hai — scanner (SHARD_MANIFEST) aur merge_chunks.py dono padhte hain
+
+Usage:
+    python shard_planner.py --shards 20 --history "history/*.status.jsonl" --products "history/*.products.jsonl"
+"""
+
+import os
+import glob
+import json
+import time
+import heapq
+import argparse
+import pandas as pd
+from result_store import normalize_domain, ResultCache
+
+INPUT_FILE     = os.getenv("INPUT_FILE", "SKU Subscription Data.csv")
+SHARD_MANIFEST = os.getenv("SHARD_MANIFEST", "shard_manifest.json")
+STORE_TIMEOUT  = int(os.getenv("STORE_TIMEOUT", "1800"))
+RESULT_CACHE_SEED = os.getenv("RESULT_CACHE_SEED", "history/result_cache.db")
+
+# History na ho to status ke hisaab se andaaza (seconds)
+STATUS_COST = {
+    "no_products":              8,
+    "no_subscription":          15,
+    "app_detected_no_products": 12,
+    "skipped":                  0,
+    "triage_dns_failed":        1,
+    "triage_not_shopify":       3,
+    "triage_duplicate":         3,
+    "triage_invalid":           0,
+}
+DEFAULT_COST   = 45.0    # bilkul naya domain
+BLOCKED_COST   = 20.0    # blocked_* / timeout ke bina elapsed
+CACHE_HIT_COST = 0.1     # fresh cache hit: scanner sirf row copy karta hai
+FOUND_BASE     = 20.0    # found store: base + SKUs * per_sku
+FOUND_PER_SKU  = 0.3
+
+def get_url_column(df):
+    for col in df.columns:
+        if any(w in col.lower() for w in ['url','domain','store','site','link','web','company']):
+            return col
+    return df.columns[0]
+
+def read_history(patterns):
+    frames = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            try:
+                if path.endswith(".jsonl"):
+                    frames.append(pd.read_json(path, lines=True, dtype=False))
+                elif path.endswith(".xlsx"):
+                    frames.append(pd.read_excel(path, sheet_name="Status_Log"))
+            except Exception as e:
+                print(f"⚠️  {path}: {e}", flush=True)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def read_skus(patterns):
+    """Store → Total_SKUs (products shards se)."""
+    skus = {}
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            try:
+                df = pd.read_json(path, lines=True, dtype=False)
+            except Exception:
+                continue
+            if {"Store", "Total_SKUs"} <= set(df.columns):
+                for store, n in df.groupby("Store")["Total_SKUs"].max().items():
+                    skus[normalize_domain(store)] = float(n)
+    return skus
+
+def estimate_costs(domains, history, skus, cache=None, max_age_h=None):
+    """domain → estimated seconds. cache: ResultCache — fresh hit waale domains ~0 (scan nahi honge)."""
+    observed = {}
+    if not history.empty and "Domain" in history:
+        history = history.assign(key=history["Domain"].map(normalize_domain)).drop_duplicates("key", keep="last")
+        for row in history.itertuples(index=False):
+            status  = str(getattr(row, "Status", ""))
+            elapsed = getattr(row, "Elapsed_s", None)
+            if status == "deferred":
+                continue    # budget ki wajah se scan hi nahi hua — koi data nahi
+            if elapsed is not None and pd.notna(elapsed):
+                cost = float(elapsed)
+                if status == "timeout":
+                    # Kaam poora nahi hua tha — asli cost isse zyada
+                    cost = max(cost, STORE_TIMEOUT) * 1.5
+                elif status == "preempted":
+                    cost *= 2    # time slice khatam hua tha, catalog ka baaki hissa abhi baaki
+            elif status == "found":
+                cost = FOUND_BASE + skus.get(row.key, 250) * FOUND_PER_SKU
+            elif status in STATUS_COST:
+                cost = STATUS_COST[status]
+            else:
+                cost = BLOCKED_COST
+            observed[row.key] = cost
+
+    fallback = float(pd.Series(list(observed.values())).median()) if observed else DEFAULT_COST
+    costs = {}
+    for d in domains:
+        key = normalize_domain(d)
+        if cache is not None and cache.get(d, max_age_h) is not None:
+            costs[d] = CACHE_HIT_COST
+        elif key in observed:
+            costs[d] = observed[key]
+        elif key in skus:
+            costs[d] = FOUND_BASE + skus[key] * FOUND_PER_SKU
+        else:
+            costs[d] = fallback
+    return costs, len(observed)
+
+def plan_shards(costs, n_shards):
+    """LPT: cost ke ulte order mein, har domain sabse kam load waale shard mein."""
+    heap   = [(0.0, i) for i in range(n_shards)]
+    shards = [{"index": i, "est_cost_s": 0.0, "domains": []} for i in range(n_shards)]
+    for domain, cost in sorted(costs.items(), key=lambda kv: (-kv[1], str(kv[0]))):
+        load, i = heapq.heappop(heap)
+        shards[i]["domains"].append(domain)
+        shards[i]["est_cost_s"] = load + cost
+        heapq.heappush(heap, (load + cost, i))
+    for s in shards:
+        s["est_cost_s"] = round(s["est_cost_s"], 1)
+    return shards
+
+def load_shard_manifest(path=SHARD_MANIFEST):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main():
+    ap = argparse.ArgumentParser(description="Cost-aware shard planner")
+    ap.add_argument("--input", default=INPUT_FILE)
+    ap.add_argument("--shards", type=int, default=int(os.getenv("CHUNK_TOTAL", "20")))
+    ap.add_argument("--history", nargs="*", default=["history/*.status.jsonl"],
+                    help="pichhle runs ke Status_Log (jsonl ya xlsx) glob patterns")
+    ap.add_argument("--products", nargs="*", default=["history/*.products.jsonl"],
+                    help="pichhle runs ke products shards (Total_SKUs ke liye)")
+    ap.add_argument("--cache", default=RESULT_CACHE_SEED,
+                    help="pichhle run ka result cache; fresh hits ki cost ~0")
+    ap.add_argument("--no-cache", action="store_true", default=os.getenv("CACHE", "1") != "1")
+    ap.add_argument("--max-age", type=float, default=float(os.getenv("MAX_AGE_H")) if os.getenv("MAX_AGE_H") else None,
+                    help="scanner jaisa hi: cached result zyada se zyada itne ghante purana")
+    ap.add_argument("--output", default=SHARD_MANIFEST)
+    args = ap.parse_args()
+
+    df_input = pd.read_csv(args.input)
+    domains  = list(dict.fromkeys(df_input[get_url_column(df_input)].dropna().tolist()))
+    history  = read_history(args.history)
+    skus     = read_skus(args.products)
+    cache    = ResultCache(args.cache) if not args.no_cache and os.path.exists(args.cache) else None
+    costs, n_known = estimate_costs(domains, history, skus, cache, args.max_age)
+    n_cached = sum(1 for c in costs.values() if c == CACHE_HIT_COST) if cache else 0
+    if cache:
+        cache.close()
+    shards   = plan_shards(costs, args.shards)
+
+    doc = {
+        "version":     1,
+        "created_at":  time.time(),
+        "input_file":  args.input,
+        "input_total": len(domains),
+        "shard_total": args.shards,
+        "history_domains": n_known,
+        "cache_hits":  n_cached,
+        "shards":      shards,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=1)
+
+    loads = [s["est_cost_s"] for s in shards]
+    print(f"📐 {len(domains)} domains → {args.shards} shards ({n_known} with history, {n_cached} cache hits)", flush=True)
+    print(f"   est. per shard: min {min(loads) / 60:.0f} min | max {max(loads) / 60:.0f} min | "
+          f"total {sum(loads) / 3600:.1f} h", flush=True)
+    print(f"✅ Saved: {args.output}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,117 @@
 """
 Shopify Subscription Extractor - Playwright Version
-- Real Chromium browser = Cloudflare 100% bypass
+- HTTP-first (httpx, HTTP/2 keep-alive); challenge page par hi real Chromium browser
 - Homepage se app detect
 - selling_plan_groups se products  
 - GitHub Actions: 20 chunks
+- Browser pool: long-lived browsers, har store ko fresh context
+- Ek asyncio event loop, CONCURRENCY stores ek saath in-flight
 """
 
 import asyncio
 import re
+from collections import deque
 from playwright.async_api import async_playwright, TimeoutError as PWTimeout
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
+from app_signatures import SignatureMatcher
+from shard_planner import load_shard_manifest
+from triage import run_triage, PASS_VERDICTS
+from metrics import StoreTrace, TraceWriter, LiveMetrics, read_traces, profile_tables, count as count_stage
+from result_store import (ResultStore, ShardWriter, FingerprintStore, CatalogFingerprint, ResultCache,
+                          chunk_range, write_manifest, normalize_domain, product_key)
 from tqdm import tqdm
 import time
 import random
 import json
 import os
+import math
+import signal
+import queue as queue_mod
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+import argparse
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 
 INPUT_FILE  = os.getenv("INPUT_FILE", "SKU Subscription Data.csv")
 OUTPUT_FILE = os.getenv("OUTPUT_FILE", "Shopify_Subscription_Deep_Analysis.xlsx")
-THREADS     = int(os.getenv("THREADS", "3"))
+OUTPUT_BASE = os.path.splitext(OUTPUT_FILE)[0]
+RESULT_DB   = os.getenv("RESULT_DB", OUTPUT_BASE + ".db")  # crash-safe per-domain results
+EXCEL_EXPORT = os.getenv("EXCEL_EXPORT", "1") == "1"   # 0 = sirf JSONL shards (merge ke liye kaafi)
+TRACE_FILE   = os.getenv("TRACE_FILE", OUTPUT_BASE + ".trace.jsonl")   # per-store stage timings
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))     # >0 = live metrics endpoint (text/plain)
+LIVE         = LiveMetrics()
+# Delta mode: pichhle run ke catalog fingerprints se sirf naye/badle products ka .js fetch
+FINGERPRINT_DB   = os.getenv("FINGERPRINT_DB", OUTPUT_BASE + ".fp.db")
+FINGERPRINT_SEED = os.getenv("FINGERPRINT_SEED", "history/fingerprints.db")   # pichhle run ka merged file
+FINGERPRINTS     = None    # main() --delta par FingerprintStore set karta hai
+# Cross-run result cache: fresh cached verdict waale stores scan nahi hote (per-status TTL)
+RESULT_CACHE      = os.getenv("RESULT_CACHE", OUTPUT_BASE + ".cache.db")
+RESULT_CACHE_SEED = os.getenv("RESULT_CACHE_SEED", "history/result_cache.db")
+CACHE_ENABLED     = os.getenv("CACHE", "1") == "1"
+CONCURRENCY = int(os.getenv("CONCURRENCY", os.getenv("THREADS") or "12"))  # ek event loop mein itne stores in-flight
 TIMEOUT     = 20000
+# Store ka base URL; bench/fake_shopify.py ke saath "http://127.0.0.1:8765/{domain}"
+STORE_URL_TEMPLATE = os.getenv("STORE_URL_TEMPLATE", "https://{domain}")
+STORE_TIMEOUT = int(os.getenv("STORE_TIMEOUT", "1800"))  # seconds; is ke baad store ka kaam cancel
+# Wall-clock budget: poora run itne minute mein (0 = off). FLUSH_RESERVE seconds report likhne ke liye bachte hain.
+# Har store ko STORE_SLICE ka time slice; progress ho aur koi intezaar mein na ho to agla slice,
+# warna partial rows + resume cursor ke saath preempt aur queue ke peeche (MAX_PREEMPTIONS tak)
+RUN_BUDGET_MIN  = float(os.getenv("RUN_BUDGET_MIN", "0"))
+FLUSH_RESERVE   = int(os.getenv("FLUSH_RESERVE", "300"))
+STORE_SLICE     = int(os.getenv("STORE_SLICE", "300"))
+STORE_SLICE_MIN = int(os.getenv("STORE_SLICE_MIN", "60"))
+MAX_PREEMPTIONS = int(os.getenv("MAX_PREEMPTIONS", "3"))
+RUN_DEADLINE    = None     # main() budget se set karta hai (epoch seconds)
+
+# Per-store pacing: token bucket (req/sec) jo 429 par aadha hota hai aur success par dheere badhta hai
+PRODUCT_CONCURRENCY = int(os.getenv("PRODUCT_CONCURRENCY", "6"))  # ek store ke in-flight .js requests
+PIPELINE_DEPTH      = int(os.getenv("PIPELINE_DEPTH", "500"))  # pagination → checkers queue (records)
+# Scan strategy: full = har product, sampled = poore store mein SAMPLE_SIZE handles (pages par
+# proportional), adaptive = estimate stable hone ya budget khatam hone tak
+SCAN_MODE             = os.getenv("SCAN_MODE", "full")
+SAMPLE_SIZE           = int(os.getenv("SAMPLE_SIZE", "100"))    # ek store ke .js checks (sampled)
+ADAPTIVE_MIN_CHECKS   = int(os.getenv("ADAPTIVE_MIN_CHECKS", "30"))
+ADAPTIVE_TOLERANCE    = float(os.getenv("ADAPTIVE_TOLERANCE", "0.05"))   # CI half-width / Total_SKUs
+ADAPTIVE_MAX_REQUESTS = int(os.getenv("ADAPTIVE_MAX_REQUESTS", "300"))   # ek store ke .js requests
+ADAPTIVE_MAX_SECONDS  = float(os.getenv("ADAPTIVE_MAX_SECONDS", "300"))
+HOST_RATE       = float(os.getenv("HOST_RATE", "4"))
+HOST_RATE_MIN   = float(os.getenv("HOST_RATE_MIN", "0.5"))
+HOST_RATE_MAX   = float(os.getenv("HOST_RATE_MAX", "20"))
+HOST_RATE_STEP  = float(os.getenv("HOST_RATE_STEP", "0.1"))
+MAX_RETRIES     = int(os.getenv("MAX_RETRIES", "4"))     # ek request ke retries
+RETRY_BUDGET    = int(os.getenv("RETRY_BUDGET", "40"))   # ek store ke total retries
+MAX_RETRY_AFTER = 60.0
 CHUNK_INDEX = int(os.getenv("CHUNK_INDEX", "0"))
 CHUNK_TOTAL = int(os.getenv("CHUNK_TOTAL", "1"))
+SHARD_MANIFEST = os.getenv("SHARD_MANIFEST", "")   # shard_planner.py ka output; set ho to contiguous slicing ki jagah
+TRIAGE      = os.getenv("TRIAGE", "1") == "1"   # scan se pehle DNS / Shopify fingerprint filter (triage.py)
+# Hybrid mode: itne processes, har ek mein apna event loop + browser pool + CONCURRENCY stores
+# (1 = single process; 0 = CPU count)
+PROCESSES   = int(os.getenv("PROCESSES", "1"))
+POOL_SIZE          = int(os.getenv("POOL_SIZE", "2"))            # long-lived browsers (saare stores share karte hain)
+BROWSER_MAX_STORES = int(os.getenv("BROWSER_MAX_STORES", "50"))  # itne stores ke baad browser recycle
 
-APP_SIGNATURES = [
-    ("Recharge",         ["rc_container", "/apps/recharge/", "data-recharge-provider", "rechargeapps.com"]),
-    ("Bold",             ["bold-ro__product", "/apps/subscriptions/", "bold_recurring_id", "boldapps.com"]),
-    ("Appstle",          ["appstle_init", "/apps/appstle-subscriptions/", "data-appstle-plan", "appstle.com"]),
-    ("Seal",             ["seal-subs", "/apps/seal-subscriptions/", "data-seal-id"]),
-    ("Skio",             ["skio-plan-picker", "/a/skio/", "data-skio-plan-id", "skio.com"]),
-    ("Loop",             ["loop-subscription-widget", "/a/loop_subscriptions/", "data-loop-id"]),
-    ("Stay AI",          ["stay-ai-widget", "/a/stay/", "data-stay-plan", "stayai.com"]),
-    ("Ordergroove",      ["og-offer", "/apps/ordergroove/", "data-og-module", "ordergroove.com"]),
-    ("Smartrr",          ["smartrr-widget", "/a/smartrr/", "data-smartrr-id", "smartrr.com"]),
-    ("PayWhirl",         ["paywhirl-widget", "/apps/paywhirl/", "data-paywhirl-id"]),
-    ("Ongoing",          ["ongoing-subscription-widget", "/apps/ongoing/", "ongoing_id"]),
-    ("Subify",           ["subify-subscription-widget", "/apps/subify/", "data-subify-plan"]),
-    ("Recurpay",         ["recurpay-widget", "/apps/recurpay/", "data-recurpay-id"]),
-    ("Propel",           ["propel-widget", "/apps/propel/", "data-propel-plan"]),
-    ("Monto",            ["monto-subscription-widget", "/apps/monto/", "data-monto-plan"]),
-    ("Simple Sub",       ["simple-sub-widget", "/apps/simple-sub/", "data-simple-plan"]),
-    ("CASA",             ["casa-widget", "/a/casa/", "data-casa-plan"]),
-    ("Subbly",           ["subbly-checkout", "/a/subbly/", "data-subbly-id", "subbly.com"]),
-    ("ChargeBee",        ["chargebee-widget", "/apps/chargebee/", "data-cb-plan-id", "chargebee.com"]),
-    ("Recurly",          ["recurly-widget", "/apps/recurly/", "data-recurly-id", "recurly.com"]),
-    ("Upscribe",         ["upscribe-widget", "/a/upscribe/", "data-upscribe-id"]),
-    ("Growave",          ["growave-sub-widget", "/apps/growave/", "data-growave-id"]),
-    ("Yotpo",            ["yotpo-sub-widget", "/apps/yotpo/", "data-yotpo-id"]),
-    ("Rebuy",            ["rebuy-sub-widget", "/apps/rebuy/", "data-rebuy-id"]),
-    ("Vitals",           ["vitals-sub-widget", "/apps/vitals/", "data-vitals-id"]),
-    ("QPilot",           ["qpilot-widget", "/apps/qpilot/", "data-qpilot-id"]),
-    ("Subflow",          ["subflow-widget", "/a/subflow/", "data-subflow-id"]),
-    ("Kaching",          ["kaching-widget", "/a/kaching/", "data-kaching-id"]),
-    ("EasySub",          ["easysub-widget", "/a/easysub/", "data-easysub-id"]),
-    ("Ongoing Recurring",["recurring-ongoing", "/apps/ongoing-recurring/", "data-recurring-id"]),
-    ("Simple Recurring", ["simple-recurring-id", "/apps/simple-recurring/", "data-recurring-plan"]),
-    ("Native Shopify",   ["selling_plan_groups", "selling_plan_id"]),
+BROWSER_ARGS = ["--no-sandbox","--disable-setuid-sandbox","--disable-blink-features=AutomationControlled"]
+USER_AGENTS  = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
 ]
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator,'webdriver',{get:()=>undefined});
+    Object.defineProperty(navigator,'plugins',{get:()=>[1,2,3]});
+    Object.defineProperty(navigator,'languages',{get:()=>['en-US','en']});
+"""
+
+# Signatures ab versioned data file (app_signatures.json) mein hain
+SIGNATURES     = SignatureMatcher.from_file()
+APP_SIGNATURES = [(name, [kw for kw, _ in pats]) for name, pats in SIGNATURES.apps]
+SAVE_HOMEPAGES_DIR = os.getenv("SAVE_HOMEPAGES_DIR", "")   # set ho to homepages yahan save (benchmark corpus)
 
 def detect_app(html):
-    h = html.lower()
-    detected = []
-    for name, kws in APP_SIGNATURES:
-        for kw in kws:
-            if kw.lower() in h:
-                detected.append(name)
-                break
-    if not detected:
-        return "Unknown"
-    named = [d for d in detected if d != "Native Shopify"]
-    return " + ".join(named) if named else "Native Shopify"
+    return SIGNATURES.detect(html)
 
 def safe_json(text):
     try:
@@ -88,149 +129,1040 @@ def extract_json_from_page(body):
         data = safe_json(body)
     return data
 
-async def scrape_store_async(domain, pw):
-    domain = str(domain).strip().lower()
-    domain = domain.replace("https://","").replace("http://","").split('/')[0]
+class BrowserPool:
+    """
+    Long-lived Chromium browsers ka pool.
+    - Har store ko fresh isolated BrowserContext milta hai (cookies/cache share nahi hote)
+    - Browser crash (disconnect) hua to agli baar naya launch
+    - max_stores ke baad browser retire, aur active contexts khatam hote hi close
+    """
+
+    def __init__(self, pw, size=1, max_stores=50):
+        self.pw         = pw
+        self.size       = max(1, size)
+        self.max_stores = max(1, max_stores)
+        self.launches   = 0
+        self._slots     = []
+        self._lock      = asyncio.Lock()
+
+    async def _launch(self):
+        browser = await self.pw.chromium.launch(headless=True, args=BROWSER_ARGS)
+        self.launches += 1
+        slot = {"browser":browser, "served":0, "active":0, "retiring":False}
+        self._slots.append(slot)
+        return slot
+
+    async def _drop(self, slot):
+        if slot in self._slots:
+            self._slots.remove(slot)
+        try:
+            await slot["browser"].close()
+        except Exception:
+            pass
+
+    async def _acquire(self):
+        async with self._lock:
+            # Health check: crashed browsers hatao
+            for slot in list(self._slots):
+                if not slot["browser"].is_connected():
+                    await self._drop(slot)
+            live = [s for s in self._slots if not s["retiring"]]
+            if len(live) < self.size:
+                live.append(await self._launch())
+            slot = min(live, key=lambda s: s["active"])
+            slot["active"] += 1
+            slot["served"] += 1
+            if slot["served"] >= self.max_stores:
+                slot["retiring"] = True
+            return slot
+
+    async def new_context(self):
+        """(lease, context) return karta hai; kaam ke baad release(lease) zaroor call karo."""
+        slot = await self._acquire()
+        try:
+            context = await slot["browser"].new_context(
+                viewport={"width":1366,"height":768},
+                user_agent=random.choice(USER_AGENTS),
+                locale="en-US",
+                timezone_id="America/New_York",
+            )
+            await context.add_init_script(STEALTH_SCRIPT)
+        except Exception:
+            await self.release(slot)
+            raise
+        return slot, context
+
+    async def release(self, slot):
+        async with self._lock:
+            slot["active"] -= 1
+            dead = not slot["browser"].is_connected()
+            if dead or (slot["retiring"] and slot["active"] <= 0):
+                await self._drop(slot)
+
+    async def close(self):
+        async with self._lock:
+            for slot in list(self._slots):
+                await self._drop(slot)
+
+CHALLENGE_MARKERS = ("just a moment", "cf-challenge", "challenge-platform", "_cf_chl_opt",
+                     "cf-browser-verification", "captcha", "attention required")
+
+def is_challenge(status, headers, text):
+    """Cloudflare / bot challenge page lag raha hai? (tab browser tier pe jao)"""
+    ctype = (headers.get("content-type") or "").lower()
+    if 200 <= status < 300 and ("json" in ctype or (text or "").lstrip()[:1] in ("{", "[")
+                                and safe_json(text) is not None):
+        return False    # asli JSON — product description mein "captcha" / "just a moment" ho sakta hai
+    if headers.get("cf-mitigated") == "challenge":
+        return True
+    # Body markers sirf HTML ya block-type statuses par (JSON body ka text challenge nahi hota)
+    if "html" in ctype or status in (403, 429, 503):
+        head = (text or "")[:4000].lower()
+        if any(m in head for m in CHALLENGE_MARKERS):
+            return True
+    return status in (403, 503)
+
+def _env_list(name, default):
+    return [x.strip().lower() for x in os.getenv(name, default).split(",") if x.strip()]
+
+# Browser routing: ye resource types / hosts context par abort hote hain
+BLOCK_RESOURCE_TYPES = set(_env_list("BLOCK_RESOURCE_TYPES", "image,media,font,stylesheet,texttrack,manifest"))
+BLOCK_HOSTS = _env_list("BLOCK_HOSTS",
+    "google-analytics.com,googletagmanager.com,doubleclick.net,facebook.net,facebook.com,"
+    "hotjar.com,clarity.ms,tiktok.com,snapchat.com,pinimg.com,pinterest.com,bing.com,"
+    "klaviyo.com,yotpo.com,judge.me,gorgias.chat,intercom.io,zendesk.com,tawk.to")
+# Store / Shopify / Cloudflare challenge ke scripts chalne do, baaki 3rd-party JS band
+SCRIPT_ALLOW_HOSTS = _env_list("SCRIPT_ALLOW_HOSTS", "cdn.shopify.com,shopifycdn.net,cloudflare.com")
+BLOCK_THIRD_PARTY_SCRIPTS = os.getenv("BLOCK_THIRD_PARTY_SCRIPTS", "1") == "1"
+
+def _host_matches(host, patterns):
+    return any(host == p or host.endswith("." + p) for p in patterns)
+
+def should_block(resource_type, url, store_domain):
+    """Routing layer ka faisla: is request ko abort karna hai?"""
+    if resource_type in BLOCK_RESOURCE_TYPES:
+        return True
+    host = urlsplit(url).hostname or ""
+    if _host_matches(host, BLOCK_HOSTS):
+        return True
+    if BLOCK_THIRD_PARTY_SCRIPTS and resource_type == "script":
+        return not (_host_matches(host, [store_domain]) or _host_matches(host, SCRIPT_ALLOW_HOSTS))
+    return False
+
+def parse_retry_after(value):
+    """Retry-After header (seconds ya HTTP-date) → seconds, MAX_RETRY_AFTER par capped."""
+    if not value:
+        return None
+    try:
+        secs = float(value)
+    except ValueError:
+        try:
+            secs = parsedate_to_datetime(value).timestamp() - time.time()
+        except Exception:
+            return None
+    return min(max(secs, 0.0), MAX_RETRY_AFTER)
+
+class HostLimiter:
+    """
+    Per-host token bucket, AIMD pacing:
+    - har successful response par rate += HOST_RATE_STEP (additive increase)
+    - 429 / Retry-After par rate aadha, aur bucket Retry-After tak band (multiplicative decrease)
+    """
+
+    def __init__(self, rate=None, min_rate=None, max_rate=None):
+        self.rate     = rate or HOST_RATE
+        self.min_rate = min_rate or HOST_RATE_MIN
+        self.max_rate = max_rate or HOST_RATE_MAX
+        self.tokens   = 1.0
+        self.updated  = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        burst = max(1.0, self.rate)
+        self.tokens  = min(burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return
+            await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + HOST_RATE_STEP)
+
+    def on_throttle(self, retry_after=None, attempt=0):
+        now = time.monotonic()
+        # Ek hi throttle window ke parallel 429s par rate baar-baar aadha mat karo
+        if now >= self.paused_until:
+            self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+        self.updated = now
+        wait = retry_after if retry_after is not None else min(MAX_RETRY_AFTER, (2 ** attempt) * random.uniform(0.5, 1.5))
+        self.paused_until = max(self.paused_until, now + wait)
+
+class StoreFetcher:
+    """
+    Tiered fetcher (ek store ke liye):
+    1. http    — pooled keep-alive httpx client (HTTP/2)
+    2. api     — Playwright context ka APIRequestContext (browser ki cookies reuse)
+    3. browser — full page.goto (JS challenge solve karta hai, cookies set karta hai)
+    Browser context tabhi banta hai jab challenge mile.
+    Har request HostLimiter se paced hai; 429/5xx/timeout par retry, lekin store ka
+    total retry budget RETRY_BUDGET tak hi.
+    """
+
+    def __init__(self, domain, client, pool, trace=None):
+        self.domain  = domain
+        self.trace   = trace or StoreTrace(domain)
+        self.client  = client
+        self.pool    = pool
+        self.lease   = None
+        self.context = None
+        self.page    = None
+        self.stats   = {"http":0, "api":0, "browser":0}
+        self.retries   = 0
+        self.throttled = 0
+        self.limiter   = HostLimiter()
+        self.retry_budget    = RETRY_BUDGET
+        self.http_challenged = False   # ek baar challenge mila to is store ke liye HTTP tier skip
+        self.bytes   = 0               # wire par aaye bytes (saare tiers)
+        self.aborted = 0               # routing layer ne kitni requests roki
+        self._page_lock = asyncio.Lock()
+        self._size_tasks = set()
+
+    async def _ensure_page(self):
+        if self.page is None:
+            with self.trace.stage("browser_context"):
+                self.lease, self.context = await self.pool.new_context()
+                await self.context.route("**/*", self._route)
+                self.page = await self.context.new_page()
+                self.page.on("requestfinished", self._on_request_finished)
+        return self.page
+
+    async def _route(self, route):
+        """Detection / JSON ke liye bekaar resources (images, fonts, CSS, trackers, 3rd-party JS) abort."""
+        request = route.request
+        if should_block(request.resource_type, request.url, self.domain):
+            self.aborted += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def _on_request_finished(self, request):
+        task = asyncio.ensure_future(self._count_bytes(request))
+        self._size_tasks.add(task)
+        task.add_done_callback(self._size_tasks.discard)
+
+    async def _count_bytes(self, request):
+        try:
+            sizes = await request.sizes()
+            self.bytes += sizes["responseHeadersSize"] + sizes["responseBodySize"]
+        except Exception:
+            pass
+
+    async def _http(self, url):
+        self.stats["http"] += 1
+        count_stage("requests")
+        resp = await self.client.get(url)
+        self.bytes += resp.num_bytes_downloaded
+        count_stage("bytes", resp.num_bytes_downloaded)
+        return resp.status_code, resp.headers, resp.text
+
+    async def _api(self, url):
+        self.stats["api"] += 1
+        count_stage("requests")
+        resp = await self.context.request.get(url, timeout=TIMEOUT)
+        body = await resp.body()
+        self.bytes += len(body)
+        count_stage("bytes", len(body))
+        return resp.status, resp.headers, body.decode("utf-8", "replace")
+
+    async def _goto(self, url, as_json=False):
+        # Ek hi page hai, isliye navigations ek-ek karke.
+        # JSON endpoint: "commit" tak hi ruko aur raw response body padho (DOM render nahi).
+        async with self._page_lock:
+            page = await self._ensure_page()
+            self.stats["browser"] += 1
+            count_stage("requests")
+            resp = await page.goto(url, timeout=TIMEOUT, wait_until="commit" if as_json else "domcontentloaded")
+            if not resp:
+                return 0, {}, ""
+            text = await resp.text() if as_json else await page.content()
+            return resp.status, resp.headers, text
+
+    async def _fetch(self, url, as_json):
+        """Ek attempt, tier escalation ke saath → (status, headers, html ya data)."""
+        parse = safe_json if as_json else (lambda t: t)
+        if not self.http_challenged:
+            status, headers, text = await self._http(url)
+            if not is_challenge(status, headers, text):
+                return status, headers, parse(text)
+            self.http_challenged = True
+        if as_json and self.context is not None:
+            status, headers, text = await self._api(url)
+            if not is_challenge(status, headers, text):
+                return status, headers, parse(text)
+        status, headers, text = await self._goto(url, as_json)
+        if as_json:
+            data = (safe_json(text) or extract_json_from_page(text)) if status == 200 else None
+            return status, headers, data
+        return status, headers, text
+
+    async def _request(self, url, as_json, max_retries):
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                status, headers, payload = await self._fetch(url, as_json)
+            except (PWTimeout, httpx.TimeoutException):
+                if attempt >= max_retries or self.retry_budget <= 0:
+                    raise
+                self.limiter.on_throttle(attempt=attempt)
+            else:
+                if status == 429 or status >= 500:
+                    if status == 429:
+                        self.throttled += 1
+                        count_stage("throttled")
+                    if attempt >= max_retries or self.retry_budget <= 0:
+                        return status, payload
+                    self.limiter.on_throttle(parse_retry_after(headers.get("retry-after")), attempt)
+                else:
+                    self.limiter.on_success()
+                    return status, payload
+            attempt += 1
+            self.retries += 1
+            count_stage("retries")
+            self.retry_budget -= 1
+
+    async def get_html(self, url, max_retries=MAX_RETRIES):
+        """(status, html) — challenge par browser navigation."""
+        return await self._request(url, False, max_retries)
+
+    async def get_json(self, url, max_retries=MAX_RETRIES):
+        """(status, data) — JSON endpoint; challenge par api tier, phir browser."""
+        return await self._request(url, True, max_retries)
+
+    async def close(self):
+        if self._size_tasks:
+            await asyncio.gather(*self._size_tasks, return_exceptions=True)
+        if self.context is not None:
+            try:
+                await self.context.close()
+            except Exception:
+                pass
+            await self.pool.release(self.lease)
+            self.context = self.page = self.lease = None
+
+def sample_allocation(sizes, n):
+    """n samples ko pages (strata) par size ke hisaab se baanto (largest remainder); sum = min(n, total)."""
+    total = sum(sizes)
+    if total <= n:
+        return list(sizes)
+    quotas = [n * s / total for s in sizes]
+    alloc  = [int(q) for q in quotas]
+    for k in sorted(range(len(sizes)), key=lambda k: alloc[k] - quotas[k])[:n - sum(alloc)]:
+        alloc[k] += 1
+    return alloc
+
+def stratified_estimate(strata, z=1.96):
+    """
+    strata: {page: [N, n, hits]} → (estimated subscription products, CI low, CI high).
+    Har page ek stratum; jis page ka koi product check nahi hua us par pooled ratio.
+    """
+    total   = sum(N for N, _, _ in strata.values())
+    checked = sum(n for _, n, _ in strata.values())
+    hits    = sum(h for _, _, h in strata.values())
+    if not checked:
+        return 0.0, 0.0, float(total)
+    pooled = hits / checked
+    est = var = 0.0
+    unchecked = 0    # in pages ka estimate ek hi pooled ratio se — errors correlated, isliye ek saath
+    for N, n, h in strata.values():
+        if n == 0:
+            est += N * pooled
+            unchecked += N
+            continue
+        p = h / n
+        est += N * p
+        # n = 1 par page ka apna variance nahi nikalta — pooled ratio ka variance lo
+        s2 = p * (1 - p) * n / (n - 1) if n > 1 else pooled * (1 - pooled)
+        var += N * N * (1 - n / N) * s2 / n
+    var += unchecked * unchecked * pooled * (1 - pooled) / checked
+    half = z * math.sqrt(var)
+    # Jo mil chuke woh pakke; jo bina plan ke mile woh bhi
+    return est, max(est - half, hits), min(est + half, total - (checked - hits))
+
+def new_http_client():
+    """Saare stores ke liye ek shared keep-alive HTTP/2 client."""
+    return httpx.AsyncClient(
+        http2=True,
+        follow_redirects=True,
+        timeout=TIMEOUT / 1000,
+        limits=httpx.Limits(max_connections=CONCURRENCY * 4, max_keepalive_connections=CONCURRENCY * 2),
+        headers={
+            "User-Agent":      USER_AGENTS[0],
+            "Accept":          "text/html,application/json;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.9",
+        },
+    )
+
+async def scrape_store_async(domain, pool, client, trace=None, resume=None, progress=None):
+    domain = normalize_domain(domain)
     if not domain:
         return {"status":"skipped","domain":domain,"rows":[]}
 
-    browser = await pw.chromium.launch(
-        headless=True,
-        args=["--no-sandbox","--disable-setuid-sandbox","--disable-blink-features=AutomationControlled"]
-    )
-    context = await browser.new_context(
-        viewport={"width":1366,"height":768},
-        user_agent=random.choice([
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
-        ]),
-        locale="en-US",
-        timezone_id="America/New_York",
-    )
-    await context.add_init_script("""
-        Object.defineProperty(navigator,'webdriver',{get:()=>undefined});
-        Object.defineProperty(navigator,'plugins',{get:()=>[1,2,3]});
-        Object.defineProperty(navigator,'languages',{get:()=>['en-US','en']});
-    """)
-    page = await context.new_page()
-    detected_app = "Unknown"
-    store_results = []
+    trace = trace or StoreTrace(domain)
+    fetch = StoreFetcher(domain, client, pool, trace)
+    info  = {}
+    try:
+        r = await _scan_store(domain, fetch, info, resume, {} if progress is None else progress)
+    finally:
+        with trace.stage("close"):
+            await fetch.close()
+    r.update(info)
+    r["stages"]    = trace.stages
+    r["app"]       = r["rows"][0]["Subscription_App"] if r["rows"] else None
+    r["tiers"]     = fetch.stats
+    r["retries"]   = fetch.retries
+    r["throttled"] = fetch.throttled
+    r["bytes"]     = fetch.bytes
+    r["aborted"]   = fetch.aborted
+    return r
 
+def save_homepage(domain, html):
     try:
-        # Step 1: Homepage
-        await asyncio.sleep(random.uniform(0.5,1.5))
+        os.makedirs(SAVE_HOMEPAGES_DIR, exist_ok=True)
+        with open(os.path.join(SAVE_HOMEPAGES_DIR, f"{domain}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+    except OSError:
+        pass
+
+async def _scan_store(domain, fetch, info, resume=None, progress=None):
+    """
+    resume: preempted store ka state ({"cursor", "app", ...}) — homepage / pre-check skip,
+    products cursor se aage. progress: scheduler ke liye live state (preempt par partial rows).
+    """
+    detected_app = "Unknown"
+    base = STORE_URL_TEMPLATE.format(domain=domain)
+    trace = fetch.trace
+    progress = {} if progress is None else progress
+
+    # Step 1: Homepage (dead domain par zyada retry nahi); resume par pichhle slice ka app
+    if resume and resume.get("app"):
+        detected_app = resume["app"]
+        info["app_confidence"] = resume.get("app_confidence")
+    else:
         try:
-            resp = await page.goto(f"https://{domain}", timeout=TIMEOUT, wait_until="domcontentloaded")
-            status = resp.status if resp else 0
+            with trace.stage("homepage"):
+                status, html = await fetch.get_html(base, max_retries=1)
             if status not in [200,301,302]:
                 return {"status":f"blocked_{status}","domain":domain,"rows":[]}
-            detected_app = detect_app(await page.content())
-        except PWTimeout:
+            with trace.stage("detect_app"):
+                matches = SIGNATURES.match(html)
+                detected_app = SIGNATURES.label(matches)
+            info["app_confidence"] = max((m["confidence"] for m in matches), default=0)
+            if SAVE_HOMEPAGES_DIR:
+                save_homepage(domain, html)
+        except (PWTimeout, httpx.TimeoutException):
             return {"status":"blocked_timeout","domain":domain,"rows":[]}
         except Exception as e:
             return {"status":f"blocked_{str(e)[:40]}","domain":domain,"rows":[]}
+    progress.update(app=detected_app, app_confidence=info.get("app_confidence"))
 
-        await asyncio.sleep(random.uniform(0.8,1.5))
+    # Step 2-4 ek pipeline: products.json ka har page compact records (index, handle, id:updated_at)
+    # mein turant queue par; checkers agla page download hote waqt hi kaam karte hain.
+    # Poore product dicts (body_html, images, variants) kabhi jama nahi hote.
+    # Resume: cursor waale page se pagination, cursor se pehle / already checked index skip
+    cursor  = resume["cursor"] if resume else 0
+    first   = cursor // 250 + 1
+    queue   = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+    fp      = CatalogFingerprint()
+    catalog = {"total":(first - 1) * 250, "changed":0, "js":0, "aborted":None, "paged":False, "truncated":False}    # aborted: (status, page)
+    strata  = {int(k): list(v) for k, v in (resume.get("strata") or {}).items()} if resume else {}    # page → [N, checked, hits]
+    carried = list(resume.get("rows") or []) if resume else []      # pichhle run ke partial rows (--resume)
+    checked_before = resume.get("checked_before", 0) if resume else 0    # cursor se pehle ke checks
+    outstanding = set()     # queue / check mein pade indexes — preempt par min() hi resume cursor hai
+    keys    = [] if FINGERPRINTS and not resume else None     # delta snapshot ke liye (handle, key), catalog order mein
+    prev    = FINGERPRINTS.load(domain) if FINGERPRINTS else None
+    prev_products = prev["products"] if prev else {}
 
-        # Step 2: products.json real browser se
-        all_products = []
-        page_num = 1
-        while True:
-            try:
-                r = await page.goto(
-                    f"https://{domain}/products.json?limit=250&page={page_num}",
-                    timeout=TIMEOUT, wait_until="domcontentloaded"
-                )
-                if r and r.status == 200:
-                    data = extract_json_from_page(await page.content())
-                    if not data:
-                        break
-                    products = data.get('products', [])
-                    if not products:
-                        break
-                    all_products.extend(products)
-                    if len(products) < 250:
+    async def enqueue(recs):
+        for rec in recs:
+            if rec[0] < cursor or rec[0] in checked:
+                continue
+            outstanding.add(rec[0])
+            await queue.put(rec)
+
+    def plan_checks(pages):
+        """
+        sampled: SAMPLE_SIZE handles pages par proportional — catalog kitna bhi bada ho, .js cost bounded.
+        adaptive: har page shuffled, pages round-robin — jahan bhi ruke, har page ka barabar hissa check.
+        rng page-seeded hai taaki resume par wahi sample / order bane.
+        """
+        if SCAN_MODE == "sampled":
+            alloc = sample_allocation([len(recs) for _, _, recs in pages], SAMPLE_SIZE)
+            return [(start + j, *records[j], page) for (start, page, records), n in zip(pages, alloc)
+                    for j in sorted(random.Random(f"{domain}:{page}").sample(range(len(records)), n))]
+        orders = []
+        for start, page, records in pages:
+            order = list(range(len(records)))
+            random.Random(f"{domain}:{page}").shuffle(order)
+            orders.append([(start + j, *records[j], page) for j in order])
+        return [rec for rnd in zip_longest(*orders) for rec in rnd if rec is not None]
+
+    async def paginate():
+        page_num = first
+        buffered = []    # sampled / adaptive: (start, page, records) — check order poora catalog dekh ke
+        try:
+            while True:
+                try:
+                    with trace.stage(f"products.json p{page_num}"):
+                        status, data = await fetch.get_json(f"{base}/products.json?limit=250&page={page_num}")
+                except (PWTimeout, httpx.TimeoutException):
+                    catalog["aborted"] = ("timeout", page_num)
+                    break
+                except Exception:
+                    catalog["aborted"] = (0, page_num)
+                    break
+                if status == 429 or status >= 500 or status == 0:
+                    # Retry / budget khatam — yeh catalog ka ant nahi, pagination adhoori
+                    catalog["aborted"] = (status, page_num)
+                    break
+                try:
+                    if status != 200 or not data:
                         break
-                    page_num += 1
-                    await asyncio.sleep(random.uniform(0.5,1.0))
-                elif r and r.status == 429:
-                    await asyncio.sleep(5)
+                    products = data.get('products') or []
+                    n_page   = len(products)
+                    # handle ke bina product check ho hi nahi sakta — skip
+                    records  = [(p['handle'], product_key(p.get('id'), p.get('updated_at')))
+                                for p in products if isinstance(p, dict) and p.get('handle')]
+                    del data, products
+                except Exception:
+                    break
+                if not n_page:
+                    break
+                start = catalog["total"]
+                strata.setdefault(page_num, [len(records), 0, 0])
+                for handle, key in records:
+                    catalog["total"] += 1
+                    fp.add(key)
+                    if prev and prev_products.get(handle, (None,))[0] != key:
+                        catalog["changed"] += 1
+                    if keys is not None:
+                        keys.append((handle, key))
+                if SCAN_MODE == "full":
+                    await enqueue((start + j, handle, key, page_num) for j, (handle, key) in enumerate(records))
                 else:
+                    buffered.append((start, page_num, records))
+                if n_page < 250:
                     break
-            except Exception:
-                break
+                page_num += 1
+                if budget_exhausted():
+                    # Adaptive time budget pagination mein hi khatam — Total_SKUs lower bound
+                    catalog["truncated"] = True
+                    break
+            catalog["paged"] = True
+            await enqueue(plan_checks(buffered))
+        finally:
+            # Sentinel hamesha (unexpected error par bhi), warna next_record() par consumers atke rehte.
+            # Cancel tabhi hota hai jab consumers khatam ho chuke — tab bhari queue par await nahi
+            if not asyncio.current_task().cancelling():
+                await queue.put(None)
 
-        total_sku = len(all_products)
-
-        if total_sku == 0:
-            if detected_app != "Unknown":
-                return {
-                    "status":"app_detected_no_products",
-                    "domain":domain,
-                    "rows":[{
-                        "Store":domain, "Subscription_App":detected_app,
-                        "Total_SKUs":0, "Product_Title":"", "Price":"",
-                        "Sub_Plans":"", "Product_Link":f"https://{domain}",
-                        "Note":"App on homepage, products.json blocked"
-                    }]
-                }
-            return {"status":"no_products","domain":domain,"rows":[]}
-
-        # Step 3: Pre-check 3 products
-        has_sub = False
-        for i in range(min(3, total_sku)):
-            try:
-                r = await page.goto(
-                    f"https://{domain}/products/{all_products[i]['handle']}.js",
-                    timeout=TIMEOUT, wait_until="domcontentloaded"
-                )
-                if r and r.status == 200:
-                    data = extract_json_from_page(await page.content())
-                    if data and data.get('selling_plan_groups'):
+    async def next_record():
+        rec = await queue.get()
+        if rec is None:
+            queue.put_nowait(None)    # baaki workers ko bhi "done" dikhe
+        return rec
+
+    found   = dict(resume.get("found") or {}) if resume else {}
+    checked = dict(resume.get("checked") or {}) if resume else {}    # i → has_sub (fetch fail hua to missing → agli baar dobara)
+
+    # Delta mode mein sirf naye / badle handles; baaki ka pichhla verdict carry forward
+    def mark(i, page, has):
+        checked[i] = has
+        strata[page][1] += 1
+        strata[page][2] += int(has)
+
+    async def check_product(rec, precheck=False):
+        has = await _check_product(rec, precheck)
+        outstanding.discard(rec[0])    # cancel hua to outstanding mein hi rahe (resume cursor)
+        return has
+
+    async def _check_product(rec, precheck):
+        i, handle, key, page = rec
+        prev_p = prev_products.get(handle)
+        if prev_p and prev_p[0] == key:
+            if prev_p[1] is not None:
+                mark(i, page, prev_p[1])
+                if prev_p[1] and prev_p[2]:
+                    found[i] = dict(prev_p[2], Subscription_App=detected_app)
+                return prev_p[1]
+            if precheck and prev["status"] == "no_subscription":
+                return False    # pichhli baar bhi yahi product pre-check mein fail hua tha
+        catalog["js"] += 1
+        try:
+            status, data = await fetch.get_json(f"{base}/products/{handle}.js")
+        except Exception:
+            return None
+        if status != 200 or not data:
+            return None
+        try:
+            plans = data.get('selling_plan_groups') or []
+            row   = {
+                "Store":            domain,
+                "Subscription_App": detected_app,
+                "Total_SKUs":       0,    # pagination khatam hone par bharte hain
+                "Product_Title":    data['title'],
+                "Price":            (data.get('price') or 0)/100,
+                "Sub_Plans":        ", ".join([pl['name'] for pl in plans]),
+                "Product_Link":     f"{base}/products/{handle}",
+                "Note":             ""
+            } if plans else None
+        except Exception:
+            return None    # kharab product payload — sirf yeh product skip, store ke baaki rows bache
+        mark(i, page, bool(plans))
+        if row:
+            found[i] = row
+        return bool(plans)
+
+    def snapshot(with_verdicts):
+        return [(h, k if (not with_verdicts or i in checked) else None,
+                 checked.get(i) if with_verdicts else None, found.get(i) if with_verdicts else None)
+                for i, (h, k) in enumerate(keys)]
+
+    def delta_label():
+        if not prev:
+            return "new"
+        if fp.hexdigest() == prev["fingerprint"]:
+            return "unchanged"
+        return f"changed:{catalog['changed']}"
+
+    def mark_aborted():
+        """products.json beech mein 429 / 5xx / timeout par ruka: Total_SKUs aur rows adhoore."""
+        status, page = catalog["aborted"]
+        info["skus_partial"]       = True
+        info["pagination_aborted"] = f"blocked_{status} at page {page}"
+
+    t_pipeline = time.time()
+
+    def budget_exhausted():
+        """Adaptive: per-store request / time budget khatam (tab pagination bhi band)."""
+        return SCAN_MODE == "adaptive" and (catalog["js"] >= ADAPTIVE_MAX_REQUESTS or
+                                            time.time() - t_pipeline >= ADAPTIVE_MAX_SECONDS)
+
+    def budget_spent():
+        """Adaptive: estimate stable ho gaya ya budget khatam — checkers ruk jaate hain."""
+        if SCAN_MODE != "adaptive":
+            return False
+        if budget_exhausted():
+            return True
+        if len(checked) < ADAPTIVE_MIN_CHECKS or not catalog["paged"]:
+            return False    # saare pages aane se pehle CI sirf padhe gaye pages ka hota — stable "lagta" hai
+        _, lo, hi = stratified_estimate(strata)
+        return (hi - lo) / 2 <= ADAPTIVE_TOLERANCE * max(catalog["total"], 1)
+
+    producer = asyncio.create_task(paginate())
+    try:
+        # Step 3: Pre-check pehle 3 products (pichhle run mein subscription mili thi to skip)
+        with trace.stage("pre_check"):
+            head = []
+            for _ in range(3):
+                rec = await next_record()
+                if rec is None:
+                    break
+                head.append(rec)
+
+            if not head and not resume:
+                if catalog["aborted"]:
+                    # products.json 429 / 5xx / timeout — "no products" nahi, retryable
+                    return {"status":f"blocked_{catalog['aborted'][0]}","domain":domain,"rows":[]}
+                if detected_app != "Unknown":
+                    return {
+                        "status":"app_detected_no_products",
+                        "domain":domain,
+                        "rows":[{
+                            "Store":domain, "Subscription_App":detected_app,
+                            "Total_SKUs":0, "Product_Title":"", "Price":"",
+                            "Sub_Plans":"", "Product_Link":base,
+                            "Note":"App on homepage, products.json blocked"
+                        }]
+                    }
+                return {"status":"no_products","domain":domain,"rows":[]}
+
+            has_sub = bool(resume) or (bool(prev) and any(has for _, has, _ in prev_products.values()))
+            if not has_sub:
+                for rec in head:
+                    if await check_product(rec, precheck=True):
                         has_sub = True
                         break
-            except Exception:
-                continue
 
         if not has_sub:
+            if keys is None:
+                return {"status":"no_subscription","domain":domain,"rows":[]}
+            # Delta: fingerprint ke liye catalog poora padho (sirf compact records)
+            with trace.stage("drain"):
+                while await next_record() is not None:
+                    pass
+                await producer
+            if catalog["aborted"]:
+                # Adhoora catalog ka fingerprint galat hoga — snapshot mat bachao
+                mark_aborted()
+                return {"status":"no_subscription","domain":domain,"rows":[]}
+            info["fingerprint"] = fp.hexdigest()
+            info["delta"]       = delta_label()
+            info["snapshot"]    = snapshot(with_verdicts=False)
             return {"status":"no_subscription","domain":domain,"rows":[]}
 
-        # Step 4: Full scan
-        for p in all_products:
+        # Step 4: Full scan — PRODUCT_CONCURRENCY checkers queue se, pacing HostLimiter karta hai.
+        # Yahan se scheduler preempt kar sakta hai: progress mein partial rows + cursor ka state
+        progress.update(phase="full_scan", found=found, checked=checked, strata=strata,
+                        outstanding=outstanding, catalog=catalog, rows=carried, checked_before=checked_before,
+                        cursor=cursor)
+        async def product_worker():
+            while not budget_spent():
+                rec = await next_record()
+                if rec is None:
+                    return
+                await check_product(rec)
+
+        with trace.stage("full_scan"):
+            checkers = [asyncio.ensure_future(c) for c in (
+                *(check_product(rec) for rec in head if rec[0] not in checked),
+                *(product_worker() for _ in range(PRODUCT_CONCURRENCY)),
+            )]
             try:
-                await asyncio.sleep(random.uniform(0.2,0.5))
-                r = await page.goto(
-                    f"https://{domain}/products/{p['handle']}.js",
-                    timeout=TIMEOUT, wait_until="domcontentloaded"
-                )
-                if r and r.status == 200:
-                    data = extract_json_from_page(await page.content())
-                    if data:
-                        plans = data.get('selling_plan_groups', [])
-                        if plans:
-                            store_results.append({
-                                "Store":            domain,
-                                "Subscription_App": detected_app,
-                                "Total_SKUs":       total_sku,
-                                "Product_Title":    data['title'],
-                                "Price":            data.get('price',0)/100,
-                                "Sub_Plans":        ", ".join([pl['name'] for pl in plans]),
-                                "Product_Link":     f"https://{domain}/products/{p['handle']}",
-                                "Note":             ""
-                            })
-            except Exception:
+                await asyncio.gather(*checkers)
+            except BaseException:
+                # Ek checker fail / cancel hua to baaki queue par atke na rahein
+                for c in checkers:
+                    c.cancel()
+                await asyncio.gather(*checkers, return_exceptions=True)
+                raise
+            if catalog["paged"] and budget_spent():
+                # Adaptive ruka: saare pages (Total_SKUs, delta keys) aa chuke, queue mein sirf unchecked
+                # records bache — unchecked pages ka estimate pooled ratio se
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+            else:
+                # Baaki pages ke compact records (Total_SKUs / estimate / delta fingerprint ke liye)
+                while await next_record() is not None:
+                    pass
+                await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    if catalog["aborted"]:
+        mark_aborted()
+    elif catalog["truncated"]:
+        info["skus_partial"] = True
+    extra = {"Total_SKUs":catalog["total"], "Scan_Mode":SCAN_MODE}
+    if info.get("pagination_aborted"):
+        extra["Note"] = f"Total_SKUs lower bound (products.json {info['pagination_aborted']})"
+    elif info.get("skus_partial"):
+        extra["Note"] = "Total_SKUs lower bound (adaptive budget)"
+    store_results = [dict(found[i], **extra) for i in sorted(found)]
+    links = {row["Product_Link"] for row in store_results}
+    store_results = [dict(row, Note="") | extra for row in carried if row["Product_Link"] not in links] + store_results
+    # full: pichhle slices / run ke carried rows bhi gino
+    est, lo, hi = (len(store_results),) * 3 if SCAN_MODE == "full" else stratified_estimate(strata)
+    for row in store_results:
+        row.update(Est_Subscription_Products=round(est, 1), CI_Low=round(lo, 1), CI_High=round(hi, 1))
+    info["checked"] = checked_before + sum(1 for i in checked if i >= cursor)
+    info["fingerprint"] = fp.hexdigest()
+    info["delta"]       = "resumed" if resume else delta_label()
+    if keys is not None and not catalog["aborted"]:
+        info["snapshot"] = snapshot(with_verdicts=True)
+
+    return {"status":"found" if store_results else "no_subscription","domain":domain,"rows":store_results}
+
+def preempted_result(domain, progress):
+    """Full scan beech mein roka: ab tak ke rows + resume state (cursor = agla unchecked product index)."""
+    if progress.get("phase") != "full_scan":
+        return None
+    catalog, found, checked = progress["catalog"], progress["found"], progress["checked"]
+    cursor = min(progress["outstanding"], default=catalog["total"])
+    rows   = list(progress["rows"]) + [dict(found[i], Total_SKUs=catalog["total"], Note="partial (preempted)")
+                                       for i in sorted(found)]
+    # checked_before: naye cursor se pehle ke checks (pichhli slice ke cursor se pehle waale already gine)
+    before = progress["checked_before"] + sum(1 for i in checked if progress["cursor"] <= i < cursor)
+    # --resume par checked / found nahi aate (cursor se aage dobara check) — strata se woh checks hatao
+    strata = {k: list(v) for k, v in progress["strata"].items()}
+    for i, has in checked.items():
+        if i >= cursor:
+            strata[i // 250 + 1][1] -= 1
+            strata[i // 250 + 1][2] -= int(has)
+    return {
+        "status":  "preempted",
+        "domain":  normalize_domain(domain),
+        "rows":    rows,
+        "cursor":  cursor,
+        "checked": before + sum(1 for i in checked if i >= cursor),
+        "checked_before": before,
+        "strata":  strata,
+        "resume":  {"cursor": cursor, "app": progress["app"], "app_confidence": progress["app_confidence"],
+                    "checked_before": before, "found": dict(found), "checked": dict(checked),
+                    "strata": {k: list(v) for k, v in progress["strata"].items()}, "rows": progress["rows"]},
+    }
+
+def store_slice():
+    """Agle store ka time slice: budget off ho to poora STORE_TIMEOUT."""
+    if RUN_DEADLINE is None:
+        return STORE_TIMEOUT
+    return max(STORE_SLICE_MIN, min(STORE_SLICE, RUN_DEADLINE - time.time()))
+
+async def scan_one(domain, pool, client, resume=None, pending=lambda: True, final=False):
+    """
+    Ek store scan karo, store_slice() ke time slice mein. Slice khatam hone par progress ho rahi ho
+    aur pending() koi intezaar mein na bataye to agla slice (STORE_TIMEOUT / RUN_DEADLINE tak);
+    warna kaam sach mein cancel — full scan mein tha to "preempted" (partial rows + cursor), nahi to "timeout".
+    final: aakhri mauka — slicing nahi, sirf STORE_TIMEOUT / RUN_DEADLINE rokte hain.
+    """
+    t0       = time.time()
+    trace    = StoreTrace(normalize_domain(domain))
+    progress = {}
+    slice_s  = store_slice()
+    hard     = min(t0 + STORE_TIMEOUT, RUN_DEADLINE or float("inf"))
+    limit    = hard if final else t0 + slice_s
+    last     = len(resume.get("checked") or {}) if resume else 0    # slice shuru par checked (resume state bhi)
+    LIVE.in_flight += 1
+    task = asyncio.create_task(scrape_store_async(domain, pool, client, trace, resume, progress))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=max(0.0, min(limit, hard) - time.time()))
+            if done:
+                break
+            made = len(progress.get("checked", ()))
+            if made > last and not pending() and time.time() < hard:
+                last, limit = made, time.time() + slice_s
                 continue
+            break
+        if task.done():
+            r = task.result()
+        else:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            r = preempted_result(domain, progress) or {"status":"timeout","domain":str(domain),"rows":[]}
+    except asyncio.CancelledError:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        raise
+    except Exception:
+        r = {"status":"error","domain":str(domain),"rows":[]}
+    finally:
+        LIVE.in_flight -= 1
+    r.setdefault("stages", trace.stages)    # timeout par bhi jo stages chale unka hisaab
+    r["elapsed"] = round(time.time() - t0, 2)
+    return r
+
+async def _scan_loop(next_domain, on_result, resumes=None):
+    """
+    CONCURRENCY workers: next_domain() se domain (None = bas), scan, on_result(r).
+    Budget mode: preempted store "requeued" mark hoke tail par (MAX_PREEMPTIONS tak), fresh domains
+    khatam hone par tail se resume. RUN_DEADLINE ke paas naya kaam band; bache domains "deferred".
+    resumes: pichhle run ke preempted stores ka {domain: resume state} (--resume).
+    """
+    resumes = resumes or {}
+    tail    = deque()    # (domain, resume state, preemptions, pichhle slices ke stages / elapsed)
+    state   = {"fresh": True}    # next_domain() se abhi aur domains aa sakte hain
+
+    def out_of_time():
+        return RUN_DEADLINE is not None and time.time() >= RUN_DEADLINE - STORE_SLICE_MIN
+
+    async with async_playwright() as pw, new_http_client() as client:
+        pool = BrowserPool(pw, size=POOL_SIZE, max_stores=BROWSER_MAX_STORES)
 
+        async def worker():
+            drained = False    # har worker next_domain() ka None sirf ek baar leta hai (hybrid sentinels)
+            while not out_of_time():
+                domain, resume, tries = None, None, 0
+                if not drained:
+                    domain = await next_domain()
+                    drained = domain is None
+                    if drained:
+                        state["fresh"] = False
+                if domain is None:
+                    if not tail:
+                        return
+                    domain, resume, tries, before = tail.popleft()
+                else:
+                    resume, before = resumes.get(normalize_domain(domain)), None
+                # MAX_PREEMPTIONS ke baad aakhri attempt budget tak chalta hai (slice / pending se nahi rukta)
+                final = RUN_DEADLINE is not None and tries + 1 >= MAX_PREEMPTIONS
+                r = await scan_one(domain, pool, client, resume,
+                                   pending=lambda: state["fresh"] or bool(tail), final=final)
+                if before:
+                    # Pichhle slices ke stages / time bhi isi result mein (trace / Profile mein store ek baar)
+                    r["stages"]  = before["stages"] + r.get("stages", [])
+                    r["elapsed"] = round(before["elapsed"] + r["elapsed"], 2)
+                if r["status"] == "preempted" and RUN_DEADLINE is not None and not final and not out_of_time():
+                    r["requeued"] = True
+                    tail.append((domain, r["resume"], tries + 1,
+                                 {"stages": r.get("stages", []), "elapsed": r["elapsed"]}))
+                on_result(r)
+
+        workers = [asyncio.create_task(worker()) for _ in range(CONCURRENCY)]
+        try:
+            await asyncio.gather(*workers)
+            if out_of_time() and state["fresh"]:
+                # Budget khatam: bache domains "deferred" (retryable) — report flush ke liye time bacha hai
+                deferred = 0
+                while (domain := await next_domain()) is not None:
+                    on_result({"status":"deferred","domain":str(domain),"rows":[],"elapsed":0})
+                    deferred += 1
+                if deferred:
+                    print(f"\n⏳ Run budget khatam — {deferred} stores deferred (--resume par scan honge)", flush=True)
+        except asyncio.CancelledError:
+            print("\n🛑 Cancelled — in-flight stores band, ab tak ka data save ho raha hai", flush=True)
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            await pool.close()
+        print(f"🌐 Browsers launched: {pool.launches}", flush=True)
+
+def _install_signal_handlers():
+    main_task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, main_task.cancel)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+async def run_scan(domains, on_result, resumes=None):
+    """
+    Single event loop scheduler: CONCURRENCY workers ek shared queue se domains uthate hain.
+    SIGINT/SIGTERM par workers cancel hote hain aur ab tak ke results bach jaate hain.
+    """
+    queue = asyncio.Queue()
+    for d in domains:
+        queue.put_nowait(d)
+
+    async def next_domain():
+        try:
+            return queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    _install_signal_handlers()
+    server = None
+    if METRICS_PORT:
+        server = await LIVE.serve(METRICS_PORT)
+        print(f"📈 Live metrics: http://0.0.0.0:{METRICS_PORT}/metrics", flush=True)
+    try:
+        await _scan_loop(next_domain, on_result, resumes)
     finally:
-        await browser.close()
+        if server is not None:
+            server.close()
 
-    return {"status":"found" if store_results else "no_subscription","domain":domain,"rows":store_results}
+def _process_worker(task_q, result_q, config):
+    """
+    Hybrid mode ka ek process: apna event loop, browser pool aur CONCURRENCY stores.
+    Domains central task_q se (jo worker khaali ho woh agla uthata hai), results result_q par
+    ("start" / "done" / "exit", pid, payload) — likhta sirf parent hai.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # Ctrl-C parent sambhalta hai
+    global SCAN_MODE, FINGERPRINTS, RUN_DEADLINE
+    SCAN_MODE    = config["scan_mode"]
+    RUN_DEADLINE = config["run_deadline"]
+    if config["fingerprint_db"]:
+        FINGERPRINTS = FingerprintStore(config["fingerprint_db"])    # sirf load(); save parent karta hai
+    pid = os.getpid()
+
+    async def loop_main():
+        loop     = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=CONCURRENCY)
 
-def run_store(domain):
-    async def _run():
-        async with async_playwright() as pw:
-            return await scrape_store_async(domain, pw)
-    return asyncio.run(_run())
+        async def next_domain():
+            domain = await loop.run_in_executor(executor, task_q.get)
+            if domain is not None:
+                result_q.put(("start", pid, domain))
+            return domain
+
+        try:
+            await _scan_loop(next_domain, lambda r: result_q.put(("done", pid, r)), config["resumes"])
+        finally:
+            executor.shutdown(wait=False)
+
+    try:
+        asyncio.run(loop_main())
+    finally:
+        result_q.put(("exit", pid, None))
+
+async def run_hybrid(domains, on_result, processes, resumes=None):
+    """
+    Multi-process × async: `processes` worker processes (har ek CONCURRENCY stores in-flight),
+    ek central work queue, aur results is process ke single writer (on_result) tak stream.
+    Koi process crash ho to uske in-flight stores "error" likhe jaate hain (--resume dobara chalata hai).
+    """
+    ctx      = mp.get_context("spawn")    # Playwright / event loops ke saath fork safe nahi
+    task_q   = ctx.Queue()
+    result_q = ctx.Queue()
+    for d in domains:
+        task_q.put(d)
+    for _ in range(processes * CONCURRENCY):
+        task_q.put(None)
+
+    config = {"scan_mode": SCAN_MODE, "fingerprint_db": FINGERPRINTS.path if FINGERPRINTS else None,
+              "run_deadline": RUN_DEADLINE, "resumes": resumes or {}}
+    procs  = [ctx.Process(target=_process_worker, args=(task_q, result_q, config), daemon=True)
+              for _ in range(processes)]
+    for p in procs:
+        p.start()
+    inflight = {p.pid: set() for p in procs}
+    alive    = set(inflight)
+    print(f"🧵 Hybrid mode: {processes} processes × {CONCURRENCY} stores", flush=True)
+
+    _install_signal_handlers()
+    server = None
+    if METRICS_PORT:
+        server = await LIVE.serve(METRICS_PORT)
+        print(f"📈 Live metrics: http://0.0.0.0:{METRICS_PORT}/metrics", flush=True)
+
+    loop = asyncio.get_running_loop()
+    try:
+        while alive:
+            try:
+                kind, pid, payload = await loop.run_in_executor(None, result_q.get, True, 1.0)
+            except queue_mod.Empty:
+                for p in procs:
+                    if p.pid in alive and not p.is_alive():
+                        lost = inflight.pop(p.pid)
+                        alive.discard(p.pid)
+                        print(f"\n💥 Worker {p.pid} exit {p.exitcode} — {len(lost)} in-flight stores error", flush=True)
+                        for d in lost:
+                            on_result({"status":"error", "domain":d, "rows":[]})
+                continue
+            if kind == "start":
+                inflight[pid].add(normalize_domain(payload))
+                LIVE.in_flight += 1
+            elif kind == "done":
+                d = normalize_domain(payload["domain"])
+                if d in inflight[pid]:    # tail se resume hue store ka "start" nahi aata
+                    inflight[pid].discard(d)
+                    LIVE.in_flight -= 1
+                on_result(payload)
+            elif kind == "exit":
+                alive.discard(pid)
+    except asyncio.CancelledError:
+        print("\n🛑 Cancelled — worker processes band, ab tak ka data save ho raha hai", flush=True)
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+            p.join(timeout=10)
+        if server is not None:
+            server.close()
 
 def get_url_column(df):
     for col in df.columns:
@@ -241,66 +1173,71 @@ def get_url_column(df):
     print(f"⚠️ Pehli column use: '{first_col}'", flush=True)
     return first_col
 
-def main():
-    print(f"📥 Loading: {INPUT_FILE}", flush=True)
-    try:
-        df_input = pd.read_csv(INPUT_FILE)
-        url_col  = get_url_column(df_input)
-        domains  = df_input[url_col].dropna().tolist()
-        print(f"Total domains: {len(domains)}", flush=True)
-    except Exception as e:
-        print(f"❌ Error: {e}", flush=True)
-        return
-
-    if CHUNK_TOTAL > 1:
-        chunk_size = len(domains) // CHUNK_TOTAL
-        start = CHUNK_INDEX * chunk_size
-        end   = start + chunk_size if CHUNK_INDEX < CHUNK_TOTAL - 1 else len(domains)
-        domains = domains[start:end]
-        print(f"🔀 Chunk {CHUNK_INDEX+1}/{CHUNK_TOTAL}: {len(domains)} stores ({start}-{end})", flush=True)
+def status_row(r):
+    """Scan result → Status_Log row."""
+    tiers = r.get("tiers", {})
+    return {
+        "Domain":r["domain"], "Status":r["status"], "Elapsed_s":r.get("elapsed"),
+        "HTTP_Requests":tiers.get("http",0), "API_Requests":tiers.get("api",0),
+        "Browser_Requests":tiers.get("browser",0),
+        "Retries":r.get("retries",0), "Throttled_429":r.get("throttled",0),
+        "KB_Transferred":round(r.get("bytes",0) / 1024, 1), "Aborted_Requests":r.get("aborted",0),
+        "App_Confidence":r.get("app_confidence"),
+        "Delta":r.get("delta", ""),
+        "Triage":r.get("triage", ""), "Canonical":r.get("canonical", ""),
+        "Scan_Mode":SCAN_MODE, "Products_Checked":r.get("checked"),
+        "Cache_Age_h":None, "Resume_Cursor":r.get("cursor"), "Total_SKUs_Partial":r.get("skus_partial", False),
+        "Pagination_Aborted":r.get("pagination_aborted", ""),
+        # preempted: --resume ke liye cursor se pehle ke checks aur unka per-page estimate state
+        "Resume_Checked_Before":r.get("checked_before"),
+        "Resume_Strata":json.dumps(r["strata"]) if r.get("strata") else "",
+    }
 
-    print(f"\n🚀 Scanning {len(domains)} stores | threads={THREADS}", flush=True)
-    print(f"🌐 Playwright real browser | 🔍 App Detection | ⚡ Pre-check\n", flush=True)
-
-    all_rows   = []
-    status_log = []
-    completed  = 0
+def write_profile(writer, traces):
+    """Profile sheet: slowest stores, per-stage p50/p95/p99, slowest stages (ek ke neeche ek)."""
+    if not traces:
+        return
+    row = 0
+    for title, df in zip(("Slowest stores", "Stage latency (p50 / p95 / p99)", "Slowest stages"),
+                         profile_tables(traces)):
+        if df.empty:
+            continue
+        df.to_excel(writer, sheet_name="Profile", index=False, startrow=row + 1)
+        writer.sheets["Profile"].cell(row=row + 1, column=1, value=title)
+        row += len(df) + 4
 
-    with ThreadPoolExecutor(max_workers=THREADS) as executor:
-        futures = {executor.submit(run_store, d): d for d in domains}
-        with tqdm(total=len(domains), dynamic_ncols=True) as pbar:
-            for future in as_completed(futures, timeout=72000):
-                try:
-                    r = future.result(timeout=120)
-                    status_log.append({"Domain":r["domain"],"Status":r["status"]})
-                    if r["rows"]:
-                        all_rows.extend(r["rows"])
-                except Exception:
-                    domain = futures[future]
-                    status_log.append({"Domain":str(domain),"Status":"timeout"})
-                completed += 1
-                pbar.update(1)
-                if completed % 50 == 0:
-                    found   = sum(1 for s in status_log if s["Status"] in ["found","app_detected_no_products"])
-                    blocked = sum(1 for s in status_log if "blocked" in s["Status"])
-                    tqdm.write(f"[{completed}/{len(domains)}] ✅ Found: {found} | ❌ Blocked: {blocked}")
+def write_report(store, scanned=0, elapsed_min=None):
+    """Result store se status summary print karo aur Excel banao."""
+    status_log = store.status_log()
+    if not status_log:
+        print("❌ Result store khaali hai — koi report nahi", flush=True)
+        return
+    all_rows = store.rows()
 
     df_log = pd.DataFrame(status_log)
     print("\n─── STATUS SUMMARY ───", flush=True)
     print(df_log["Status"].value_counts().to_string(), flush=True)
+    if elapsed_min is not None:
+        print(f"⏱️  {scanned} stores in {elapsed_min:.1f} min → {scanned / max(elapsed_min, 1e-9):.1f} stores/min", flush=True)
+    if "KB_Transferred" in df_log:
+        print(f"📶 {df_log['KB_Transferred'].sum() / 1024:.1f} MB transferred (avg {df_log['KB_Transferred'].mean():.0f} KB/store)", flush=True)
 
     with pd.ExcelWriter(OUTPUT_FILE, engine='openpyxl') as writer:
         if all_rows:
             df_detail = pd.DataFrame(all_rows)
             df_detail.to_excel(writer, sheet_name="Subscription_Products", index=False)
             summary = []
-            for store, grp in df_detail.groupby("Store"):
+            for store_name, grp in df_detail.groupby("Store"):
                 summary.append({
-                    "Store":                 store,
+                    "Store":                 store_name,
                     "Subscription_App":      grp["Subscription_App"].iloc[0],
                     "Total_SKUs":            grp["Total_SKUs"].iloc[0],
                     "Subscription_Products": len(grp),
                     "Ratio":                 f"{len(grp)}/{grp['Total_SKUs'].iloc[0]}",
+                    "Est_Subscription_Products": grp["Est_Subscription_Products"].iloc[0] if "Est_Subscription_Products" in grp else len(grp),
+                    "CI_Low":                grp["CI_Low"].iloc[0] if "CI_Low" in grp else len(grp),
+                    "CI_High":               grp["CI_High"].iloc[0] if "CI_High" in grp else len(grp),
+                    "Scan_Mode":             grp["Scan_Mode"].iloc[0] if "Scan_Mode" in grp else "full",
                     "Plan_Names":            " | ".join(str(x) for x in grp["Sub_Plans"].unique()[:5]),
                     "Product_Names":         " | ".join(grp["Product_Title"].tolist()[:10])
                 })
@@ -309,8 +1246,192 @@ def main():
             app_counts.columns = ["App","Count"]
             app_counts.to_excel(writer, sheet_name="App_Usage", index=False)
         df_log.to_excel(writer, sheet_name="Status_Log", index=False)
+        write_profile(writer, read_traces(TRACE_FILE))
 
     print(f"\n✅ Saved: {OUTPUT_FILE}", flush=True)
 
+def parse_args():
+    ap = argparse.ArgumentParser(description="Shopify subscription deep scanner")
+    ap.add_argument("--resume", action="store_true", default=os.getenv("RESUME") == "1",
+                    help="RESULT_DB mein terminal status waale domains skip, sirf failed/timeout dobara")
+    ap.add_argument("--delta", action="store_true", default=os.getenv("DELTA") == "1",
+                    help="pichhle run ke fingerprints se sirf naye/badle products fetch karo")
+    ap.add_argument("--no-triage", action="store_true", default=not TRIAGE,
+                    help="DNS / Shopify pre-flight triage skip karo (TRIAGE=0)")
+    ap.add_argument("--scan-mode", choices=["full", "sampled", "adaptive"], default=SCAN_MODE,
+                    help="full = har product; sampled = store se SAMPLE_SIZE handles; adaptive = stable estimate / budget tak")
+    ap.add_argument("--processes", type=int, default=PROCESSES,
+                    help="hybrid multi-process mode: worker processes (0 = CPU count, 1 = single process)")
+    ap.add_argument("--no-cache", action="store_true", default=not CACHE_ENABLED,
+                    help="cross-run result cache mat padho (CACHE=0); naye results phir bhi likhe jaate hain")
+    ap.add_argument("--max-age", type=float, default=float(os.getenv("MAX_AGE_H")) if os.getenv("MAX_AGE_H") else None,
+                    help="cached result zyada se zyada itne ghante purana ho (per-status TTL se kam hi)")
+    ap.add_argument("--report-only", action="store_true",
+                    help="scan mat karo, sirf RESULT_DB se Excel banao")
+    return ap.parse_args()
+
+def main():
+    t_run = time.time()    # run budget yahin se (cache / triage bhi isi mein)
+    args  = parse_args()
+    global SCAN_MODE
+    SCAN_MODE = args.scan_mode
+    store = ResultStore(RESULT_DB)
+    print(f"💾 Result store: {RESULT_DB}", flush=True)
+    if args.report_only:
+        write_report(store)
+        store.close()
+        return
+
+    print(f"📥 Loading: {INPUT_FILE}", flush=True)
+    try:
+        df_input = pd.read_csv(INPUT_FILE)
+        url_col  = get_url_column(df_input)
+        domains  = df_input[url_col].dropna().tolist()
+        print(f"Total domains: {len(domains)}", flush=True)
+    except Exception as e:
+        print(f"❌ Error: {e}", flush=True)
+        return
+
+    input_total = len(domains)
+    plan = load_shard_manifest(SHARD_MANIFEST)
+    if plan:
+        shard   = plan["shards"][CHUNK_INDEX]
+        domains = shard["domains"]
+        print(f"📐 Shard {CHUNK_INDEX+1}/{plan['shard_total']} ({SHARD_MANIFEST}): {len(domains)} stores, "
+              f"est. {shard['est_cost_s'] / 60:.0f} min", flush=True)
+        manifest = dict(chunk_index=CHUNK_INDEX, chunk_total=plan["shard_total"], input_file=INPUT_FILE,
+                        input_total=plan["input_total"], shard_manifest=os.path.basename(SHARD_MANIFEST),
+                        est_cost_s=shard["est_cost_s"], domains=len(domains))
+    else:
+        start, end = chunk_range(input_total, CHUNK_TOTAL, CHUNK_INDEX)
+        if CHUNK_TOTAL > 1:
+            domains = domains[start:end]
+            print(f"🔀 Chunk {CHUNK_INDEX+1}/{CHUNK_TOTAL}: {len(domains)} stores ({start}-{end})", flush=True)
+        manifest = dict(chunk_index=CHUNK_INDEX, chunk_total=CHUNK_TOTAL, input_file=INPUT_FILE,
+                        input_total=input_total, domain_start=start, domain_end=end, domains=len(domains))
+
+    resumes = {}    # preempted store → cursor se aage (partial rows carry forward)
+    if args.resume:
+        done    = store.done_domains()
+        before  = len(domains)
+        domains = [d for d in domains if normalize_domain(d) not in done]
+        for log in store.status_log():
+            if log["Status"] == "preempted" and log.get("Resume_Cursor") is not None:
+                _, rows = store.get(log["Domain"])
+                resumes[normalize_domain(log.get("Canonical") or log["Domain"])] = {
+                    "cursor": int(log["Resume_Cursor"]), "app": rows[0]["Subscription_App"] if rows else None,
+                    "app_confidence": log.get("App_Confidence"), "rows": rows,
+                    "checked_before": int(log.get("Resume_Checked_Before") or 0),
+                    "strata": json.loads(log.get("Resume_Strata") or "{}")}
+        print(f"♻️  Resume: {before - len(domains)} done, {len(domains)} re-queued "
+              f"({len(resumes)} from a cursor)", flush=True)
+    else:
+        store.reset()
+    shards = ShardWriter(OUTPUT_BASE, append=args.resume)
+    traces = TraceWriter(TRACE_FILE, append=args.resume)
+    global FINGERPRINTS
+    if args.delta:
+        FINGERPRINTS = FingerprintStore(FINGERPRINT_DB, seed=FINGERPRINT_SEED)
+        print(f"🔁 Delta mode: {FINGERPRINT_DB} (seed: {FINGERPRINT_SEED})", flush=True)
+    manifest["shards"] = {"products": os.path.basename(shards.products_path),
+                          "status":   os.path.basename(shards.status_path),
+                          "trace":    os.path.basename(traces.path)}
+    write_manifest(OUTPUT_BASE, finished=False, **manifest)
+
+    # Result cache: pichhle runs ka fresh verdict ho to scan hi mat karo
+    cache = ResultCache(RESULT_CACHE, seed=RESULT_CACHE_SEED)
+    if domains and not args.no_cache:
+        fresh = []
+        for d in domains:
+            hit = cache.get(d, args.max_age)
+            if hit is None:
+                fresh.append(d)
+                continue
+            log, rows, age_h = hit
+            log = dict(log, Cache_Age_h=round(age_h, 1))
+            store.put(log, rows)
+            shards.write(log, rows)
+        print(f"🗄️  Result cache: {len(domains) - len(fresh)} fresh hits, {len(fresh)} to scan "
+              f"({RESULT_CACHE}, {len(cache)} entries)", flush=True)
+        domains = fresh
+
+    # Triage: dead / non-Shopify / duplicate domains ka verdict seedha Status_Log mein
+    origin = {}    # canonical host → input domain (Status_Log / resume input domain par chalte hain)
+    if domains and not args.no_triage:
+        t0 = time.time()
+        verdicts = asyncio.run(run_triage(domains, headers={"User-Agent": USER_AGENTS[0]}))
+        survivors = []
+        for v in verdicts:
+            if v["verdict"] in PASS_VERDICTS:
+                origin[v["canonical"]] = v
+                survivors.append(v["canonical"])
+                continue
+            row = status_row({"domain":v["domain"], "status":f"triage_{v['verdict']}", "rows":[],
+                              "triage":", ".join(v["signals"]) or v["verdict"], "canonical":v["canonical"]})
+            store.put(row, [])
+            shards.write(row, [])
+            cache.put(row, [])
+        print(f"🩺 Triage: {len(survivors)}/{len(domains)} plausible Shopify stores "
+              f"({time.time() - t0:.0f}s)", flush=True)
+        domains = survivors
+
+    print(f"\n🚀 Scanning {len(domains)} stores | concurrency={CONCURRENCY} | mode={SCAN_MODE}", flush=True)
+    print(f"🌐 Playwright real browser | 🔍 App Detection | ⚡ Pre-check\n", flush=True)
+
+    status_log = []
+    completed  = 0
+    t_start    = time.time()
+    global RUN_DEADLINE
+    if RUN_BUDGET_MIN > 0:
+        RUN_DEADLINE = t_run + RUN_BUDGET_MIN * 60 - FLUSH_RESERVE
+        print(f"⏱️  Run budget: {RUN_BUDGET_MIN:g} min, scanning till "
+              f"{time.strftime('%H:%M:%S', time.localtime(RUN_DEADLINE))} | slice {STORE_SLICE}s", flush=True)
+
+    with tqdm(total=len(domains), dynamic_ncols=True) as pbar:
+        def on_result(r):
+            nonlocal completed
+            v = origin.get(r["domain"])
+            if v:
+                r.update(domain=v["domain"], canonical=v["canonical"],
+                         triage=", ".join(v["signals"]) or v["verdict"])
+            row = status_row(r)
+            store.put(row, r["rows"])
+            shards.write(row, r["rows"])
+            cache.put(row, r["rows"])
+            if r.get("requeued"):
+                return    # tail par dobara aayega; trace / counters / progress tab (saare slices ke saath)
+            traces.write(r)
+            LIVE.observe(r)
+            if FINGERPRINTS and r.get("snapshot") is not None and r["status"] in ("found", "no_subscription"):
+                FINGERPRINTS.save(r.get("canonical") or r["domain"], r["fingerprint"], r["status"], r.get("app"),
+                                  len(r["snapshot"]), r["snapshot"])
+            status_log.append(row)
+            completed += 1
+            pbar.update(1)
+            if completed % 50 == 0:
+                found   = sum(1 for s in status_log if s["Status"] in ["found","app_detected_no_products"])
+                blocked = sum(1 for s in status_log if "blocked" in s["Status"])
+                rate    = completed / max((time.time() - t_start) / 60, 1e-9)
+                tqdm.write(f"[{completed}/{len(domains)}] ✅ Found: {found} | ❌ Blocked: {blocked} | ⚡ {rate:.1f} stores/min")
+
+        processes = min(args.processes or os.cpu_count() or 1, max(len(domains), 1))
+        if domains and processes > 1:
+            asyncio.run(run_hybrid(domains, on_result, processes, resumes))
+        elif domains:
+            asyncio.run(run_scan(domains, on_result, resumes))
+
+    shards.close()
+    traces.close()
+    evicted = cache.evict()
+    if evicted:
+        print(f"🗄️  Result cache: {evicted} expired entries evicted", flush=True)
+    cache.close()
+    if FINGERPRINTS:
+        FINGERPRINTS.close()
+    write_manifest(OUTPUT_BASE, finished=True, scanned=completed, **manifest)
+    if EXCEL_EXPORT:
+        write_report(store, completed, (time.time() - t_start) / 60)
+    store.close()
+
 if __name__ == "__main__":
     main()
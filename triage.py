@@ -0,0 +1,157 @@
+"""
+triage.py - Sasta pre-flight filter (browser / product scan se pehle)
+- Concurrent DNS resolve — dead domains turant bahar
+- Redirects follow karke canonical host (custom domain / myshopify)
+- Same store par redirect hone waale domains dedupe
+- Shopify fingerprints: response headers, cookies, homepage markers, /products.json
+- Sirf plausible Shopify stores (ya challenge waale, jinhe browser hi parakh sakta hai) aage jaate hain
+
+Usage:
+    python triage.py --input "SKU Subscription Data.csv" --output triage.jsonl
+"""
+
+import os
+import json
+import socket
+import asyncio
+import argparse
+import httpx
+from result_store import normalize_domain
+
+TRIAGE_CONCURRENCY = int(os.getenv("TRIAGE_CONCURRENCY", "50"))
+TRIAGE_TIMEOUT     = float(os.getenv("TRIAGE_TIMEOUT", "8"))    # seconds, har request
+DNS_TIMEOUT        = float(os.getenv("DNS_TIMEOUT", "5"))
+
+SHOPIFY_HEADERS = ("x-shopid", "x-shopify-stage", "x-sorting-hat-shopid", "x-sorting-hat-podid",
+                   "x-shardid", "x-storefront-renderer-rendered", "x-shopify-request-id")
+SHOPIFY_COOKIES = ("_shopify_y", "_shopify_s", "secure_customer_sig", "cart_currency", "_tracking_consent")
+SHOPIFY_MARKERS = ("cdn.shopify.com", "shopify.theme", "myshopify.com", "shopify-section", "/cdn/shop/")
+CHALLENGE_STATUSES = {401, 403, 429, 503}   # bot wall / password page — browser tier decide karega
+
+# Verdict → aage scan hoga?
+PASS_VERDICTS = {"shopify", "challenged"}
+
+def shopify_signals(resp):
+    """Homepage response mein Shopify ke nishaan."""
+    signals = [h for h in SHOPIFY_HEADERS if h in resp.headers]
+    if "shopify" in resp.headers.get("powered-by", "").lower():
+        signals.append("powered-by")
+    cookies = " ".join(resp.headers.get_list("set-cookie"))
+    signals += [c for c in SHOPIFY_COOKIES if c + "=" in cookies]
+    if resp.url.host.endswith(".myshopify.com"):
+        signals.append("myshopify-host")
+    body = resp.text[:200_000].lower()
+    signals += [m for m in SHOPIFY_MARKERS if m in body]
+    return signals
+
+async def products_json_ok(client, host):
+    try:
+        resp = await client.get(f"https://{host}/products.json?limit=1")
+        return resp.status_code == 200 and "products" in resp.json()
+    except (httpx.HTTPError, ValueError):
+        return False
+
+async def triage_one(domain, client):
+    """→ {"domain", "canonical", "verdict", "signals"}"""
+    host = normalize_domain(domain)
+    out  = {"domain": host, "canonical": host, "verdict": "invalid", "signals": []}
+    if not host:
+        return out
+
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.wait_for(loop.getaddrinfo(host, 443, type=socket.SOCK_STREAM), DNS_TIMEOUT)
+    except (OSError, asyncio.TimeoutError):
+        out["verdict"] = "dns_failed"
+        return out
+    except ValueError:
+        return out    # UnicodeError: khaali / 63+ char label (foo..com) — invalid
+
+    try:
+        resp = await client.get(f"https://{host}/")
+    except (httpx.InvalidURL, ValueError):
+        return out
+    except httpx.HTTPError:
+        out["verdict"] = "unreachable"
+        return out
+    out["canonical"] = normalize_domain(resp.url.host)
+
+    signals = shopify_signals(resp)
+    if await products_json_ok(client, out["canonical"]):
+        signals.append("products.json")
+    out["signals"] = signals
+    if signals:
+        out["verdict"] = "shopify"
+    elif resp.status_code in CHALLENGE_STATUSES:
+        out["verdict"] = "challenged"
+    else:
+        out["verdict"] = "not_shopify"
+    return out
+
+def new_triage_client(headers=None):
+    return httpx.AsyncClient(
+        http2=True,
+        follow_redirects=True,
+        timeout=TRIAGE_TIMEOUT,
+        limits=httpx.Limits(max_connections=TRIAGE_CONCURRENCY * 2, max_keepalive_connections=TRIAGE_CONCURRENCY),
+        headers=headers,
+    )
+
+async def run_triage(domains, concurrency=TRIAGE_CONCURRENCY, client=None, headers=None):
+    """
+    Saare domains ka triage (input order mein verdicts).
+    Jo domain kisi pehle domain ke canonical host par redirect ho, woh "duplicate".
+    """
+    sem = asyncio.Semaphore(concurrency)
+    own = client is None
+    if own:
+        client = new_triage_client(headers)
+
+    async def one(d):
+        async with sem:
+            try:
+                return await triage_one(d, client)
+            except Exception as e:
+                # Ek kharab row poore chunk ka triage na gira de; unreachable --resume par dobara
+                host = normalize_domain(d)
+                return {"domain": host, "canonical": host, "verdict": "unreachable", "signals": [str(e)[:80]]}
+
+    try:
+        results = await asyncio.gather(*(one(d) for d in domains))
+    finally:
+        if own:
+            await client.aclose()
+
+    seen = {}
+    for r in results:
+        if r["verdict"] not in PASS_VERDICTS:
+            continue
+        first = seen.setdefault(r["canonical"], r["domain"])
+        if first != r["domain"]:
+            r["verdict"] = "duplicate"
+            r["signals"] = [f"same store as {first}"]
+    return results
+
+def main():
+    import pandas as pd
+    from shard_planner import get_url_column
+
+    ap = argparse.ArgumentParser(description="Pre-flight Shopify triage")
+    ap.add_argument("--input", default=os.getenv("INPUT_FILE", "SKU Subscription Data.csv"))
+    ap.add_argument("--output", default="triage.jsonl")
+    ap.add_argument("--concurrency", type=int, default=TRIAGE_CONCURRENCY)
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.input)
+    domains = list(dict.fromkeys(df[get_url_column(df)].dropna().tolist()))
+    results = asyncio.run(run_triage(domains, args.concurrency))
+    with open(args.output, "w", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r) + "\n")
+
+    counts = pd.Series([r["verdict"] for r in results]).value_counts()
+    print(counts.to_string(), flush=True)
+    print(f"✅ Saved: {args.output}", flush=True)
+
+if __name__ == "__main__":
+    main()